@@ -1,27 +1,52 @@
 from p1_support import load_level, show_level, save_level_costs
+from p1_graph import CompiledGraph, compiled_shortest_path, compiled_shortest_path_to_all
+from p1_queues import make_queue
+from p1_compact import compact_shortest_path, compact_shortest_path_to_all
 from math import inf, sqrt
+from time import perf_counter
 from heapq import heappop, heappush, heapify
 import sys
 
 
-def dijkstras_shortest_path(initial_position, destination, graph, adj):
+def dijkstras_shortest_path(initial_position, destination, graph, adj, heuristic=None, queue='heap', stats=None,
+                            compact=False):
     """ Searches for a minimal cost path through a graph using Dijkstra's algorithm.
 
     Args:
         initial_position: The initial cell from which the path extends.
         destination: The end location for the path.
-        graph: A loaded level, containing walls, spaces, and waypoints.
+        graph: A loaded level, containing walls, spaces, and waypoints, or a CompiledGraph built from one.
         adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+            Ignored for a CompiledGraph, which already holds its edges.
+        heuristic: An optional function estimating the remaining cost from a cell to the destination. When given,
+            the search runs as A*; the estimate must never exceed the true remaining cost.
+        queue: The priority queue to use, 'heap' or 'bucket' (see p1_queues). The bucket queue relies on every edge
+            costing at least the cheapest cell cost, as with navigation_edges, and cannot be combined with a
+            heuristic.
+        stats: An optional SearchStats (see p1_stats) to fill in with counters and the time spent searching and
+            rebuilding the path.
+        compact: Whether to keep the search state in flat arrays over the level's bounding box instead of
+            dictionaries (see p1_compact), which takes far less memory on large levels.
 
     Returns:
         If a path exits, return a list containing all cells from initial_position to destination.
         Otherwise, return None.
 
     """
-
-    # assembling queue on heap
-    priorityQ = []
-    heappush(priorityQ, (0, initial_position))
+    if heuristic is not None and queue != 'heap':
+        raise ValueError('Error: A* needs the heap queue.')
+    if isinstance(graph, CompiledGraph):
+        return compiled_shortest_path(initial_position, destination, graph, heuristic, queue, stats)
+    if compact:
+        return compact_shortest_path(initial_position, destination, graph, adj, heuristic, queue, stats)
+
+    # assembling queue
+    priorityQ, push, pop = make_queue(queue, lambda: min(graph['spaces'].values()))
+    if stats is not None:
+        push, pop = stats.wrap_queue(priorityQ, push, pop)
+        adj = stats.wrap_adj(adj)
+        start = perf_counter()
+    push((0, initial_position))
 
     # back pointer
     came_from = {initial_position: None}
@@ -29,27 +54,171 @@ def dijkstras_shortest_path(initial_position, destination, graph, adj):
     # keeps track of cost
     cost_so_far = {initial_position: 0}
 
+    # cells that have already been expanded
+    closed = set()
+
     while priorityQ:
-        current_cost, current_node = heappop(priorityQ)
+        current_priority, current_node = pop()
+
+        if current_node in closed:  # stale queue entry
+            continue
+        closed.add(current_node)
+        current_cost = cost_so_far[current_node]
 
         if current_node == destination:
+            if stats is not None:
+                stats.add_time('search', start)
+                stats.finish(len(closed))
+                start = perf_counter()
             print("Total cost = ", cost_so_far[current_node], '\n')
+            print("Nodes expanded = ", len(closed), '\n')
             curr = current_node
             path = []
             while curr != None:
                 path.append(curr)
                 curr = came_from[curr]
+            if stats is not None:
+                stats.add_time('path', start)
             return path
 
-        for new_node, new_cost in navigation_edges(graph, current_node):
+        for new_node, new_cost in adj(graph, current_node):
             pathCost = new_cost + current_cost
             if new_node not in cost_so_far or pathCost < cost_so_far[new_node]:
                 cost_so_far[new_node] = pathCost
-                heappush(priorityQ, (pathCost, new_node))
+                priority = pathCost if heuristic is None else pathCost + heuristic(new_node)
+                push((priority, new_node))
                 came_from[new_node] = current_node
+
+    if stats is not None:
+        stats.add_time('search', start)
+        stats.finish(len(closed))
     return None
 
 
+def octile_heuristic(level, destination, min_cost=None):
+    """ Builds an admissible A* heuristic for the edge costs produced by navigation_edges.
+
+    Every step costs at least the cheapest cell cost in the level (times sqrt(2) on a diagonal), so the octile
+    distance scaled by that cost never overestimates the remaining cost.
+
+    Args:
+        level: A loaded level, containing walls, spaces, and waypoints.
+        destination: The end location for the path.
+        min_cost: A lower bound on every cell cost to scale by instead of the level's cheapest cost, which is
+            then not looked up.
+
+    Returns:
+        A function mapping a cell to a lower bound on its cost to destination.
+    """
+    if min_cost is None:
+        min_cost = min(level['spaces'].values())
+    diagonal = (sqrt(2) - 1) * min_cost
+    dx, dy = destination
+
+    def heuristic(cell):
+        x = abs(cell[0] - dx)
+        y = abs(cell[1] - dy)
+        if x < y:
+            x, y = y, x
+        return min_cost * x + diagonal * y
+
+    return heuristic
+
+
+def a_star_shortest_path(initial_position, destination, graph, adj, stats=None):
+    """ Searches for a minimal cost path through a graph using A* with the octile heuristic.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        destination: The end location for the path.
+        graph: A loaded level, containing walls, spaces, and waypoints.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+        stats: An optional SearchStats to fill in.
+
+    Returns:
+        If a path exits, return a list containing all cells from initial_position to destination.
+        Otherwise, return None.
+
+    """
+    return dijkstras_shortest_path(initial_position, destination, graph, adj,
+                                   heuristic=octile_heuristic(graph, destination), stats=stats)
+
+
+def bidirectional_dijkstras_shortest_path(initial_position, destination, graph, adj):
+    """ Searches for a minimal cost path by running Dijkstra's algorithm forward from initial_position and backward
+    from destination at the same time.
+
+    The backward search walks the same edges as the forward one, which relies on adj returning symmetric costs
+    (as navigation_edges does). The search stops once the smallest keys of the two queues add up to at least the
+    cost of the best path found through an edge joining the two searches.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        destination: The end location for the path.
+        graph: A loaded level, containing walls, spaces, and waypoints.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+
+    Returns:
+        If a path exits, return a list containing all cells from initial_position to destination.
+        Otherwise, return None.
+
+    """
+    if initial_position == destination:
+        print("Total cost = ", 0, '\n')
+        print("Nodes expanded = ", 0, '\n')
+        return [destination]
+
+    # index 0 holds the forward search, index 1 the backward search
+    queues = ([(0, initial_position)], [(0, destination)])
+    came_from = ({initial_position: None}, {destination: None})
+    cost_so_far = ({initial_position: 0}, {destination: 0})
+    closed = (set(), set())
+
+    # cheapest known path through an edge joining the two searches
+    best_cost = inf
+    meeting = None
+
+    while queues[0] and queues[1]:
+        if queues[0][0][0] + queues[1][0][0] >= best_cost:
+            break
+
+        side = 0 if queues[0][0][0] <= queues[1][0][0] else 1
+        current_cost, current_node = heappop(queues[side])
+        if current_node in closed[side]:  # stale queue entry
+            continue
+        closed[side].add(current_node)
+
+        costs, other_costs = cost_so_far[side], cost_so_far[1 - side]
+        for new_node, new_cost in adj(graph, current_node):
+            pathCost = new_cost + current_cost
+            if new_node not in costs or pathCost < costs[new_node]:
+                costs[new_node] = pathCost
+                heappush(queues[side], (pathCost, new_node))
+                came_from[side][new_node] = current_node
+            if new_node in other_costs and pathCost + other_costs[new_node] < best_cost:
+                best_cost = pathCost + other_costs[new_node]
+                meeting = (current_node, new_node) if side == 0 else (new_node, current_node)
+
+    if meeting is None:
+        return None
+
+    print("Total cost = ", best_cost, '\n')
+    print("Nodes expanded = ", len(closed[0]) + len(closed[1]), '\n')
+
+    # destination side first, to match the order dijkstras_shortest_path returns
+    path = []
+    curr = meeting[1]
+    while curr != None:
+        path.append(curr)
+        curr = came_from[1][curr]
+    path.reverse()
+    curr = meeting[0]
+    while curr != None:
+        path.append(curr)
+        curr = came_from[0][curr]
+    return path
+
+
 def find_node(node, pqueue):
     for element in pqueue:
         if element[1] == node:
@@ -57,21 +226,45 @@ def find_node(node, pqueue):
     return False
 
 
-def dijkstras_shortest_path_to_all(initial_position, graph, adj):
+def dijkstras_shortest_path_to_all(initial_position, graph, adj, parents=None, queue='heap', stats=None,
+                                   compact=False, max_cost=None, max_cells=None):
     """ Calculates the minimum cost to every reachable cell in a graph from the initial_position.
 
     Args:
         initial_position: The initial cell from which the path extends.
-        graph: A loaded level, containing walls, spaces, and waypoints.
+        graph: A loaded level, containing walls, spaces, and waypoints, or a CompiledGraph built from one.
         adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+            Ignored for a CompiledGraph, which already holds its edges.
+        parents: An optional dictionary that is filled with the back pointer of every reached cell, so paths can
+            be rebuilt with path_from_parents.
+        queue: The priority queue to use, 'heap' or 'bucket' (see p1_queues).
+        stats: An optional SearchStats (see p1_stats) to fill in with counters and the time spent searching.
+        compact: Whether to keep the search state in flat arrays over the level's bounding box instead of
+            dictionaries (see p1_compact). The result is then a read-only CompactCosts view, whose path method
+            rebuilds paths without a parents dictionary. Ignored with max_cost or max_cells, whose dictionaries
+            only grow with the region searched, while the arrays would span the whole level.
+        max_cost: If given, cells costing more than this are not expanded or returned, so only the region within
+            this budget is searched.
+        max_cells: If given, stop once this many cells are settled. Cells settle cheapest first (within a bucket's
+            width for the bucket queue).
 
     Returns:
-        A dictionary, mapping destination cells to the cost of a path from the initial_position.
+        A dictionary, mapping destination cells to the cost of a path from the initial_position. With max_cost or
+        max_cells, only the cells whose cost was settled are included.
     """
-
-    # assembling queue on heap
-    priorityQ = []
-    heappush(priorityQ, (0, initial_position))
+    bounded = max_cost is not None or max_cells is not None
+    if isinstance(graph, CompiledGraph):
+        return compiled_shortest_path_to_all(initial_position, graph, parents, queue, stats, max_cost, max_cells)
+    if compact and not bounded:
+        return compact_shortest_path_to_all(initial_position, graph, adj, parents, queue, stats)
+
+    # assembling queue
+    priorityQ, push, pop = make_queue(queue, lambda: min(graph['spaces'].values()))
+    if stats is not None:
+        push, pop = stats.wrap_queue(priorityQ, push, pop)
+        adj = stats.wrap_adj(adj)
+        start = perf_counter()
+    push((0, initial_position))
 
     # back pointer
     came_from = {initial_position: None}
@@ -79,19 +272,164 @@ def dijkstras_shortest_path_to_all(initial_position, graph, adj):
     # keeps track of cost
     cost_so_far = {initial_position: 0}
 
+    # cells whose cost is final, only kept when the search is bounded
+    settled = {}
+    over_budget = 0
+
+    while priorityQ:
+        current_cost, current_node = pop()
+        if current_cost > cost_so_far[current_node]:  # stale queue entry
+            continue
+
+        if bounded:
+            if max_cost is not None and current_cost > max_cost:
+                over_budget += 1
+                continue  # over budget; a bucket queue may still hold cheaper entries
+            if max_cells is not None and len(settled) >= max_cells:
+                over_budget += 1
+                break
+            settled[current_node] = current_cost
+
+        for new_node, new_cost in adj(graph, current_node):
+            pathCost = new_cost + current_cost
+            if new_node not in cost_so_far or pathCost < cost_so_far[new_node]:
+                cost_so_far[new_node] = pathCost
+                push((pathCost, new_node))
+                came_from[new_node] = current_node
+
+    if bounded:
+        came_from = {cell: came_from[cell] for cell in settled}
+        cost_so_far = settled
+
+    if stats is not None:
+        stats.add_time('search', start)
+        # each reached cell is popped exactly once at its final cost
+        stats.finish(len(cost_so_far), over_budget)
+
+    if parents is not None:
+        parents.update(came_from)
+
+    return cost_so_far
+
+
+def dijkstras_shortest_paths_to_targets(initial_positions, targets, graph, adj, k=None):
+    """ Searches for minimal cost paths to several targets at once, stopping as soon as they are all settled.
+
+    Args:
+        initial_positions: A list of initial cells; each target is reached from whichever of them is cheapest.
+        targets: The cells to find paths to.
+        graph: A loaded level, containing walls, spaces, and waypoints.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+        k: If given, stop once the k nearest targets are settled instead of all of them.
+
+    Returns:
+        A dictionary mapping each reached target to its (cost, path) pair, nearest target first. Paths run from the
+        target back to the initial cell it was reached from, in the order dijkstras_shortest_path returns.
+        Unreachable targets, and with k the targets beyond the k nearest, are left out.
+    """
+    remaining = set(targets)
+    wanted = len(remaining) if k is None else min(k, len(remaining))
+
+    cost_so_far = {}
+    came_from = {}
+    found = {}
+    if wanted:
+        for current_cost, current_node in _settle(initial_positions, graph, adj, cost_so_far, came_from):
+            if current_node in remaining:
+                found[current_node] = current_cost
+                if len(found) == wanted:
+                    break
+
+    return {target: (cost, path_from_parents(came_from, target)) for target, cost in found.items()}
+
+
+def dijkstras_multi_source_to_all(initial_positions, graph, adj, parents=None):
+    """ Calculates the minimum cost to every reachable cell from the nearest of several initial positions.
+
+    Args:
+        initial_positions: A list of initial cells.
+        graph: A loaded level, containing walls, spaces, and waypoints.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+        parents: An optional dictionary that is filled with the back pointer of every reached cell, leading back
+            to its nearest initial cell.
+
+    Returns:
+        A dictionary, mapping destination cells to the cost of a path from the nearest initial position.
+    """
+    cost_so_far = {}
+    came_from = {}
+    for _ in _settle(initial_positions, graph, adj, cost_so_far, came_from):
+        pass
+
+    if parents is not None:
+        parents.update(came_from)
+
+    return cost_so_far
+
+
+def _settle(initial_positions, graph, adj, cost_so_far, came_from):
+    # runs Dijkstra's algorithm from every initial position at once, filling cost_so_far and came_from and
+    # yielding each cell with its final cost as it is settled, so callers can stop early
+
+    # assembling queue on heap
+    priorityQ = []
+    for cell in initial_positions:
+        if cell not in cost_so_far:
+            cost_so_far[cell] = 0
+            came_from[cell] = None
+            priorityQ.append((0, cell))
+    heapify(priorityQ)
+
     while priorityQ:
         current_cost, current_node = heappop(priorityQ)
+        if current_cost > cost_so_far[current_node]:  # stale queue entry
+            continue
+        yield current_cost, current_node
 
-        for new_node, new_cost in navigation_edges(graph, current_node):
+        for new_node, new_cost in adj(graph, current_node):
             pathCost = new_cost + current_cost
             if new_node not in cost_so_far or pathCost < cost_so_far[new_node]:
                 cost_so_far[new_node] = pathCost
                 heappush(priorityQ, (pathCost, new_node))
                 came_from[new_node] = current_node
 
-    return cost_so_far
 
-    pass
+def path_cost(level, path, adj):
+    """ Adds up the edge costs along a path.
+
+    Args:
+        level: A loaded level, containing walls, spaces, and waypoints.
+        path: A list of cells, each adjacent to the next.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+
+    Returns:
+        The total cost of the path.
+    """
+    cost = 0
+    for cell, next_cell in zip(path, path[1:]):
+        cost += dict(adj(level, cell))[next_cell]
+    return cost
+
+
+def path_from_parents(parents, destination):
+    """ Rebuilds a path from the back pointers filled in by dijkstras_shortest_path_to_all.
+
+    Args:
+        parents: A dictionary mapping each reached cell to the cell it was reached from.
+        destination: The end location for the path.
+
+    Returns:
+        If destination was reached, a list of cells in the same order dijkstras_shortest_path returns.
+        Otherwise, return None.
+    """
+    if destination not in parents:
+        return None
+    curr = destination
+    path = []
+    while curr != None:
+        path.append(curr)
+        curr = parents[curr]
+    return path
 
 
 def navigation_edges(level, cell):
@@ -139,18 +477,25 @@ def navigation_edges(level, cell):
     return adj
 
 
-def test_route(filename, src_waypoint, dst_waypoint):
+def test_route(filename, src_waypoint, dst_waypoint, search=dijkstras_shortest_path, stats=None):
     """ Loads a level, searches for a path between the given waypoints, and displays the result.
 
     Args:
         filename: The name of the text file containing the level.
         src_waypoint: The character associated with the initial waypoint.
         dst_waypoint: The character associated with the destination waypoint.
+        search: The path search function to use, e.g. dijkstras_shortest_path, a_star_shortest_path or
+            bidirectional_dijkstras_shortest_path.
+        stats: An optional SearchStats to fill in and print after the route; search must then accept a stats
+            argument, as dijkstras_shortest_path and a_star_shortest_path do.
 
     """
 
     # Load and display the level.
+    start = perf_counter()
     level = load_level(filename)
+    if stats is not None:
+        stats.add_time('load_level', start)
     show_level(level)
 
     # Retrieve the source and destination coordinates from the level.
@@ -158,14 +503,20 @@ def test_route(filename, src_waypoint, dst_waypoint):
     dst = level['waypoints'][dst_waypoint]
 
     # Search for and display the path from src to dst.
-    path = dijkstras_shortest_path(src, dst, level, navigation_edges)
+    if stats is None:
+        path = search(src, dst, level, navigation_edges)
+    else:
+        path = search(src, dst, level, navigation_edges, stats=stats)
     if path:
         show_level(level, path)
     else:
         print("No path possible!")
 
+    if stats is not None:
+        stats.report()
+
 
-def cost_to_all_cells(filename, src_waypoint, output_filename):
+def cost_to_all_cells(filename, src_waypoint, output_filename, stats=None):
     """ Loads a level, calculates the cost to all reachable cells from
     src_waypoint, then saves the result in a csv file with name output_filename.
 
@@ -173,19 +524,27 @@ def cost_to_all_cells(filename, src_waypoint, output_filename):
         filename: The name of the text file containing the level.
         src_waypoint: The character associated with the initial waypoint.
         output_filename: The filename for the output csv file.
+        stats: An optional SearchStats to fill in and print after the file is saved.
 
     """
 
     # Load and display the level.
+    start = perf_counter()
     level = load_level(filename)
+    if stats is not None:
+        stats.add_time('load_level', start)
     show_level(level)
 
     # Retrieve the source coordinates from the level.
     src = level['waypoints'][src_waypoint]
 
     # Calculate the cost to all reachable cells from src and save to a csv file.
-    costs_to_all_cells = dijkstras_shortest_path_to_all(src, level, navigation_edges)
+    costs_to_all_cells = dijkstras_shortest_path_to_all(src, level, navigation_edges, stats=stats)
+    start = perf_counter()
     save_level_costs(level, costs_to_all_cells, output_filename)
+    if stats is not None:
+        stats.add_time('save_level_costs', start)
+        stats.report()
 
 
 
@@ -0,0 +1,201 @@
+# ALT (A*, landmarks, triangle inequality) heuristics for P1
+
+from array import array
+from math import inf
+from struct import Struct
+from sys import byteorder
+import os
+
+from p1 import dijkstras_shortest_path, dijkstras_shortest_path_to_all, navigation_edges
+from p1_support import load_level
+from p1_waypoints import level_hash
+
+# landmark file layout: header, landmark cells, one float64 distance table per landmark in sorted cell order
+LANDMARK_MAGIC = b'P1LM'
+LANDMARK_HEADER = Struct('<4s32sII')  # magic, sha256 of the level file, landmark count, cell count
+LANDMARK_CELL = Struct('<II')  # x, y
+LANDMARK_SUFFIX = '.landmarks'
+
+
+class Landmarks:
+    """ Distance tables from a few landmark cells, used to bound the cost between any two cells.
+
+    Edge costs from navigation_edges are symmetric, so for any landmark L the triangle inequality gives
+    cost(v, t) >= |d(L, t) - d(L, v)|. The largest of these bounds over all landmarks is an admissible and
+    consistent A* heuristic that, unlike the octile distance, knows about walls and expensive cells.
+
+    Attributes:
+        cells: The level's spaces in sorted order; the tables are indexed in this order.
+        index: A dictionary mapping each cell to its position in cells.
+        landmarks: The landmark cells.
+        tables: One array('d') per landmark with its cost to every cell, inf for unreachable cells.
+    """
+
+    def __init__(self, cells, landmarks, tables):
+        self.cells = cells
+        self.index = {cell: i for i, cell in enumerate(cells)}
+        self.landmarks = landmarks
+        self.tables = tables
+
+    def heuristic(self, destination):
+        """ Builds the ALT heuristic toward a destination.
+
+        Args:
+            destination: The end location for the path.
+
+        Returns:
+            A function mapping a cell to a lower bound on its cost to destination.
+        """
+        index = self.index
+        t = index.get(destination)
+        if t is None:
+            return lambda cell: 0
+
+        # landmarks that cannot reach the destination give no bound
+        pairs = [(table, table[t]) for table in self.tables if table[t] != inf]
+
+        def heuristic(cell):
+            i = index.get(cell)
+            if i is None:
+                return 0
+            bound = 0
+            for table, to_destination in pairs:
+                to_cell = table[i]
+                if to_cell == inf:  # a different region than the destination
+                    continue
+                if to_destination > to_cell:
+                    to_cell = to_destination - to_cell
+                else:
+                    to_cell -= to_destination
+                if to_cell > bound:
+                    bound = to_cell
+            return bound
+
+        return heuristic
+
+
+def build_landmarks(level, k=8, adj=navigation_edges):
+    """ Picks k landmarks on a level and calculates their distance tables.
+
+    Landmarks are chosen by farthest-point selection: the first is the cell farthest from an arbitrary start and
+    each next one is the cell farthest from all landmarks chosen so far, which spreads them around the edges of
+    the level where their bounds are tightest. Each landmark costs one dijkstras_shortest_path_to_all, whose
+    result is reused as its table.
+
+    Args:
+        level: A loaded level, containing walls, spaces, and waypoints.
+        k: The number of landmarks.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+
+    Returns:
+        The Landmarks for the level.
+    """
+    cells = sorted(level['spaces'])
+    landmarks = []
+    tables = []
+    if not cells:
+        return Landmarks(cells, landmarks, tables)
+
+    # closest landmark cost per cell, cells not reached by any landmark yet count as farthest
+    nearest = [inf] * len(cells)
+    costs = dijkstras_shortest_path_to_all(cells[0], level, adj)
+    candidate = max(costs, key=lambda cell: (costs[cell], cell))
+
+    for _ in range(k):
+        costs = dijkstras_shortest_path_to_all(candidate, level, adj)
+        table = array('d', [costs.get(cell, inf) for cell in cells])
+        landmarks.append(candidate)
+        tables.append(table)
+
+        for i, cost in enumerate(table):
+            if cost < nearest[i]:
+                nearest[i] = cost
+        # farthest cell from all landmarks, preferring cells in regions no landmark reaches
+        best = max(range(len(cells)), key=lambda i: (nearest[i], cells[i]))
+        if nearest[best] == 0:  # every cell is a landmark
+            break
+        candidate = cells[best]
+
+    return Landmarks(cells, landmarks, tables)
+
+
+def save_landmarks(landmarks, filename, digest):
+    """ Saves landmark tables to a binary file.
+
+    Args:
+        landmarks: The Landmarks to save.
+        filename: The name of the landmark file.
+        digest: The sha256 hex digest of the level file the landmarks were built from.
+    """
+    # write then rename so a concurrent reader never sees a partial file
+    with open(filename + '.tmp', 'wb') as f:
+        f.write(LANDMARK_HEADER.pack(LANDMARK_MAGIC, bytes.fromhex(digest), len(landmarks.landmarks),
+                                     len(landmarks.cells)))
+        for x, y in landmarks.landmarks:
+            f.write(LANDMARK_CELL.pack(x, y))
+        for table in landmarks.tables:
+            if byteorder != 'little':
+                table = array('d', table)
+                table.byteswap()
+            table.tofile(f)
+    os.replace(filename + '.tmp', filename)
+
+
+def load_landmarks(filename, k=8, adj=navigation_edges):
+    """ Loads the landmarks for a level file, building and saving them next to it if needed.
+
+    The landmark file is the level's filename with '.landmarks' appended. It records the sha256 of the level
+    file, so an edited level, or a different k, rebuilds the tables. A level with fewer than k spaces gets one
+    landmark per space.
+
+    Args:
+        filename: The name of the text file containing the level.
+        k: The number of landmarks.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+            Saved tables are only valid for the adj they were built with.
+
+    Returns:
+        The Landmarks for the level.
+    """
+    level = load_level(filename)
+    digest = level_hash(filename)
+    landmark_file = filename + LANDMARK_SUFFIX
+    cells = sorted(level['spaces'])
+
+    if os.path.exists(landmark_file):
+        with open(landmark_file, 'rb') as f:
+            magic, saved_digest, count, n = LANDMARK_HEADER.unpack(f.read(LANDMARK_HEADER.size))
+            if magic == LANDMARK_MAGIC and saved_digest.hex() == digest and count == min(k, n) and n == len(cells):
+                landmarks = [LANDMARK_CELL.unpack(f.read(LANDMARK_CELL.size)) for _ in range(count)]
+                tables = []
+                for _ in range(count):
+                    table = array('d')
+                    table.fromfile(f, n)
+                    if byteorder != 'little':
+                        table.byteswap()
+                    tables.append(table)
+                return Landmarks(cells, landmarks, tables)
+
+    landmarks = build_landmarks(level, k, adj)
+    save_landmarks(landmarks, landmark_file, digest)
+    return landmarks
+
+
+def alt_shortest_path(initial_position, destination, graph, adj, landmarks, queue='heap', stats=None):
+    """ Searches for a minimal cost path with A* guided by landmark distance tables.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        destination: The end location for the path.
+        graph: A loaded level, containing walls, spaces, and waypoints.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+        landmarks: The Landmarks for graph, from build_landmarks or load_landmarks.
+        queue: The priority queue to use; only 'heap' supports a heuristic.
+        stats: An optional SearchStats to fill in.
+
+    Returns:
+        If a path exits, return a list containing all cells from initial_position to destination.
+        Otherwise, return None.
+    """
+    return dijkstras_shortest_path(initial_position, destination, graph, adj,
+                                   heuristic=landmarks.heuristic(destination), queue=queue, stats=stats)
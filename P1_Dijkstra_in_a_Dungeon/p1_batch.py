@@ -0,0 +1,52 @@
+# Parallel batch route queries for P1
+
+from multiprocessing import get_all_start_methods, get_context
+import os
+import sys
+
+from p1 import dijkstras_shortest_path, navigation_edges, path_cost
+from p1_support import load_level
+
+# the level and search function held by each worker process
+_level = None
+_search = None
+
+
+def _init_worker(level, search):
+    global _level, _search
+    _level = level
+    _search = search
+    # the search functions print their totals, which would interleave across workers
+    sys.stdout = open(os.devnull, 'w')
+
+
+def _route(pair):
+    src, dst = pair
+    src_cell = _level['waypoints'][src] if isinstance(src, str) else src
+    dst_cell = _level['waypoints'][dst] if isinstance(dst, str) else dst
+    path = _search(src_cell, dst_cell, _level, navigation_edges)
+    return src, dst, path, path_cost(_level, path[::-1], navigation_edges) if path else None
+
+
+def batch_routes(filename, pairs, processes=None, search=dijkstras_shortest_path, chunksize=16):
+    """ Loads a level once and answers many route queries on it across a pool of worker processes.
+
+    Where the platform supports fork, workers inherit the loaded level from the parent instead of receiving a
+    pickled copy each.
+
+    Args:
+        filename: The name of the text file containing the level.
+        pairs: An iterable of (src, dst) pairs, each a waypoint character or a cell.
+        processes: The number of worker processes, one per core by default.
+        search: The path search function to use, with the signature of dijkstras_shortest_path.
+        chunksize: The number of queries sent to a worker at a time.
+
+    Yields:
+        A (src, dst, path, cost) tuple per query as soon as it completes, in completion order. path and cost are
+        None when there is no path.
+    """
+    level = load_level(filename)
+
+    context = get_context('fork' if 'fork' in get_all_start_methods() else None)
+    with context.Pool(processes, initializer=_init_worker, initargs=(level, search)) as pool:
+        yield from pool.imap_unordered(_route, pairs, chunksize)
@@ -0,0 +1,171 @@
+# Pathfinding benchmarks for P1
+
+from argparse import ArgumentParser
+from contextlib import redirect_stdout
+from random import Random
+from tempfile import TemporaryDirectory
+from time import perf_counter
+import json
+import os
+import platform
+import tracemalloc
+
+from p1 import dijkstras_shortest_path, dijkstras_shortest_path_to_all, navigation_edges
+from p1_stats import SearchStats
+from p1_support import WALL, load_level, save_level_costs
+
+SIZES = (64, 128, 256, 512, 1024, 2048, 4096)
+KINDS = ('open', 'corridors', 'rooms', 'noise')
+ROOM_SIZE = 16
+
+
+def generate_maze(kind, size, seed=0):
+    """ Generates a square level in the text format load_level reads.
+
+    Args:
+        kind: 'open' for a walled field of cost 1 cells, 'corridors' for a perfect maze of one-cell-wide
+            corridors, 'rooms' for a grid of rooms joined by doors, or 'noise' for an open field of random costs.
+        size: The width and height of the level, in cells.
+        seed: The random seed, so the same arguments always give the same level.
+
+    Returns:
+        The level as a list of strings, one per row, with waypoint 'a' near the top left and 'b' near the
+        bottom right.
+    """
+    rng = Random(seed)
+    grid = [[WALL] * size for _ in range(size)]
+
+    if kind in ('open', 'noise'):
+        for y in range(1, size - 1):
+            for x in range(1, size - 1):
+                grid[y][x] = str(rng.randint(1, 9)) if kind == 'noise' else '1'
+
+    elif kind == 'corridors':
+        # iterative depth-first carving over the odd cells
+        grid[1][1] = '1'
+        stack = [(1, 1)]
+        while stack:
+            x, y = stack[-1]
+            options = [(dx, dy) for dx, dy in ((2, 0), (-2, 0), (0, 2), (0, -2))
+                       if 0 < x + dx < size - 1 and 0 < y + dy < size - 1 and grid[y + dy][x + dx] == WALL]
+            if not options:
+                stack.pop()
+                continue
+            dx, dy = rng.choice(options)
+            grid[y + dy // 2][x + dx // 2] = '1'
+            grid[y + dy][x + dx] = '1'
+            stack.append((x + dx, y + dy))
+
+    elif kind == 'rooms':
+        for y in range(1, size - 1):
+            for x in range(1, size - 1):
+                if x % ROOM_SIZE and y % ROOM_SIZE:
+                    grid[y][x] = str(rng.randint(1, 3))
+        # a door in the wall to the right of and below every room
+        for top in range(0, size - 1, ROOM_SIZE):
+            for left in range(0, size - 1, ROOM_SIZE):
+                right, bottom = left + ROOM_SIZE, top + ROOM_SIZE
+                if right < size - 1:
+                    grid[rng.randint(top + 1, min(bottom, size - 1) - 1)][right] = '1'
+                if bottom < size - 1:
+                    grid[bottom][rng.randint(left + 1, min(right, size - 1) - 1)] = '1'
+
+    else:
+        raise ValueError('Error: unknown maze kind ' + repr(kind) + '.')
+
+    cells = [(x, y) for y in range(size) for x in range(size) if grid[y][x] != WALL]
+    (ax, ay), (bx, by) = cells[0], cells[-1]
+    grid[ay][ax] = 'a'
+    grid[by][bx] = 'b'
+    return [''.join(row) for row in grid]
+
+
+def _measure(function, memory):
+    # runs function once, returning its result, the seconds it took and, if memory is set, its peak allocation
+    if memory:
+        tracemalloc.start()
+    start = perf_counter()
+    result = function()
+    seconds = perf_counter() - start
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _best_time(function, repeat):
+    # the fastest of repeat runs, the least disturbed by whatever else the machine was doing
+    return min(_measure(function, False)[1] for _ in range(repeat))
+
+
+def run_benchmarks(sizes=SIZES, kinds=KINDS, seed=0, memory=True, repeat=3):
+    """ Times load_level, dijkstras_shortest_path, dijkstras_shortest_path_to_all and save_level_costs.
+
+    Each phase is timed repeat times and the fastest run is reported. The nodes behind nodes_per_sec are the
+    cells loaded, expanded by the point search (counted in an extra run with a SearchStats) or costed.
+    Peak memory is measured with tracemalloc in a separate run of each phase, so it does not slow the timings.
+
+    Args:
+        sizes: The level sizes to generate.
+        kinds: The maze kinds to generate (see generate_maze).
+        seed: The random seed for the generated levels.
+        memory: Whether to measure peak memory.
+        repeat: How many times to time each phase.
+
+    Returns:
+        A list of result dictionaries, one per level and phase.
+    """
+    results = []
+    with TemporaryDirectory() as directory, open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+        for kind in kinds:
+            for size in sizes:
+                filename = os.path.join(directory, '%s_%d.txt' % (kind, size))
+                with open(filename, 'w') as f:
+                    f.write('\n'.join(generate_maze(kind, size, seed)) + '\n')
+
+                level = load_level(filename)
+                src, dst = level['waypoints']['a'], level['waypoints']['b']
+                costs = dijkstras_shortest_path_to_all(src, level, navigation_edges)
+                stats = SearchStats()
+                dijkstras_shortest_path(src, dst, level, navigation_edges, stats=stats)
+                phases = [
+                    ('load_level', lambda: load_level(filename), len(level['spaces'])),
+                    ('dijkstras_shortest_path',
+                     lambda: dijkstras_shortest_path(src, dst, level, navigation_edges), stats.expanded),
+                    ('dijkstras_shortest_path_to_all',
+                     lambda: dijkstras_shortest_path_to_all(src, level, navigation_edges), len(costs)),
+                    ('save_level_costs',
+                     lambda: save_level_costs(level, costs, os.path.join(directory, 'costs.csv')), len(costs)),
+                ]
+
+                for phase, function, nodes in phases:
+                    seconds = _best_time(function, repeat)
+                    peak = _measure(function, True)[2] if memory else None
+                    results.append({'kind': kind,
+                                    'size': size,
+                                    'cells': len(level['spaces']),
+                                    'phase': phase,
+                                    'seconds': seconds,
+                                    'nodes_per_sec': nodes / seconds if nodes and seconds else None,
+                                    'peak_bytes': peak})
+    return results
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Benchmark the P1 pathfinding code on generated mazes.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--kinds', nargs='+', choices=KINDS, default=KINDS)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--no-memory', action='store_true', help='skip the peak memory runs')
+    parser.add_argument('--repeat', type=int, default=3, help='time each phase this many times and keep the best')
+    parser.add_argument('--output', default='bench_results.json')
+    args = parser.parse_args()
+
+    results = run_benchmarks(args.sizes, args.kinds, args.seed, not args.no_memory, args.repeat)
+    with open(args.output, 'w') as f:
+        json.dump({'python': platform.python_version(),
+                   'platform': platform.platform(),
+                   'seed': args.seed,
+                   'results': results}, f, indent=2)
+    print('Saved file:', args.output)
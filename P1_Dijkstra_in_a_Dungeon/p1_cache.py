@@ -0,0 +1,116 @@
+# Path query caching for P1
+
+from collections import OrderedDict
+
+from p1 import dijkstras_shortest_path, dijkstras_shortest_path_to_all, navigation_edges, path_from_parents
+from p1_support import GridLevel
+
+
+def level_fingerprint(level):
+    """ Returns a value that changes whenever a level's walls or spaces change.
+
+    A GridLevel tracks its own edits, so its fingerprint is only recomputed after a change. A dict level is
+    hashed in full on every call, which costs more than a short search on a large level, so it only suits
+    one-off checks such as validating saved preprocessing.
+    """
+    if isinstance(level, GridLevel):
+        return level.fingerprint()
+    return hash((frozenset(level['walls']), frozenset(level['spaces'].items())))
+
+
+def _grid_fingerprint(level):
+    # the cache refuses dict levels, which would be rehashed in full on every query, hits included
+    if not isinstance(level, GridLevel):
+        raise TypeError('Error: PathCache needs a GridLevel; load the level with load_level_grid.')
+    return level.fingerprint()
+
+
+class PathCache:
+    """ A bounded LRU cache in front of dijkstras_shortest_path and dijkstras_shortest_path_to_all.
+
+    Entries are keyed by the level fingerprint, so editing a level's walls or spaces makes its old entries
+    unreachable and they age out of the cache. A cached one-to-all tree answers every path query from its source.
+    Levels must be GridLevels (see load_level_grid), whose fingerprints are only recomputed after an edit, so a
+    cache hit costs a few dictionary lookups.
+
+    Attributes:
+        max_entries: The largest number of paths and trees kept.
+        max_cells: The largest number of cells kept across all cached paths and trees, a rough bound on memory.
+        hits: Path queries answered from a cached path.
+        tree_hits: Path queries answered from a cached one-to-all tree.
+        misses: Queries that had to run a search.
+        evictions: Entries dropped to stay within the limits.
+    """
+
+    def __init__(self, max_entries=1024, max_cells=1000000, adj=navigation_edges):
+        self.max_entries = max_entries
+        self.max_cells = max_cells
+        self.adj = adj
+        self.hits = 0
+        self.tree_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._cells = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def shortest_path(self, initial_position, destination, level):
+        """ Returns what dijkstras_shortest_path would, reusing cached paths and trees where possible. """
+        fingerprint = _grid_fingerprint(level)
+        key = ('path', fingerprint, initial_position, destination)
+
+        cached = self._get(key)
+        if cached is not None:
+            self.hits += 1
+            return list(cached[0]) if cached[0] else None
+
+        tree = self._get(('tree', fingerprint, initial_position))
+        if tree is not None:
+            self.tree_hits += 1
+            return path_from_parents(tree[1], destination)
+
+        self.misses += 1
+        path = dijkstras_shortest_path(initial_position, destination, level, self.adj)
+        self._put(key, (list(path) if path else None,), len(path) if path else 1)
+        return path
+
+    def shortest_path_to_all(self, initial_position, level):
+        """ Returns what dijkstras_shortest_path_to_all would, keeping the search tree for later path queries. """
+        key = ('tree', _grid_fingerprint(level), initial_position)
+
+        tree = self._get(key)
+        if tree is not None:
+            self.hits += 1
+            return dict(tree[0])
+
+        self.misses += 1
+        parents = {}
+        costs = dijkstras_shortest_path_to_all(initial_position, level, self.adj, parents)
+        self._put(key, (dict(costs), parents), 2 * len(parents))
+        return costs
+
+    def clear(self):
+        """ Drops every cached entry, keeping the counters. """
+        self._entries.clear()
+        self._cells = 0
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _put(self, key, value, cells):
+        if cells > self.max_cells:  # would evict everything else and still not fit
+            return
+        if key in self._entries:
+            self._cells -= self._entries.pop(key)[1]
+        self._entries[key] = (value, cells)
+        self._cells += cells
+        while len(self._entries) > self.max_entries or self._cells > self.max_cells:
+            _, (_, old_cells) = self._entries.popitem(last=False)
+            self._cells -= old_cells
+            self.evictions += 1
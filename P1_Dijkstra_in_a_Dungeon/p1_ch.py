@@ -0,0 +1,304 @@
+# Contraction hierarchies for P1
+
+from array import array
+from heapq import heappop, heappush
+from math import inf
+import pickle
+
+from p1 import navigation_edges
+from p1_cache import level_fingerprint
+
+# cells a witness search may settle before giving up and keeping the shortcut
+WITNESS_LIMIT = 32
+
+
+class ContractionHierarchy:
+    """ A level's graph with every cell contracted in turn, following Geisberger et al.'s contraction hierarchies.
+
+    Contracting a cell removes it and adds a shortcut between each pair of its remaining neighbors whose cheapest
+    connection went through it. Each cell keeps its edges to cells contracted after it (its upward edges), and a
+    shortest path always climbs to a highest cell and back down, so a query only needs two small Dijkstra
+    searches over upward edges, one from each end. Shortcuts remember the cell they bypass, which is how paths
+    are unpacked back into cells.
+
+    Edge costs must be symmetric, as they are for navigation_edges.
+
+    Attributes:
+        cells: The level's spaces in sorted order; cells are numbered by their position in this list.
+        index: A dictionary mapping each cell to its number.
+        offsets: The upward edges of cell number u are at positions offsets[u] to offsets[u + 1] of the arrays
+            targets (the cell numbers they lead to), weights (their costs) and middles (the cell number a shortcut
+            bypasses, or -1 for an edge between neighbors).
+        fingerprint: The level_fingerprint of the level at build time.
+    """
+
+    def __init__(self, cells, offsets, targets, weights, middles, fingerprint):
+        self.cells = cells
+        self.offsets = offsets
+        self.targets = targets
+        self.weights = weights
+        self.middles = middles
+        self.fingerprint = fingerprint
+        self._index = None
+        self._source = None
+
+    @property
+    def index(self):
+        self._load()
+        if self._index is None:
+            self._index = {cell: i for i, cell in enumerate(self.cells)}
+        return self._index
+
+    def _load(self):
+        # reads a hierarchy saved by save_contraction_hierarchy on first use
+        if self._source is None:
+            return
+        filename, level = self._source
+        with open(filename, 'rb') as f:
+            data = pickle.load(f)
+        if data['fingerprint'] != level_fingerprint(level):
+            raise ValueError('Error: contraction hierarchy was built for a different level.')
+        self.cells = data['cells']
+        self.offsets = data['offsets']
+        self.targets = data['targets']
+        self.weights = data['weights']
+        self.middles = data['middles']
+        self.fingerprint = data['fingerprint']
+        self._source = None
+
+    def shortest_path(self, initial_position, destination):
+        """ Searches for a minimal cost path between two cells.
+
+        Args:
+            initial_position: The initial cell from which the path extends.
+            destination: The end location for the path.
+
+        Returns:
+            If a path exits, return a list containing all cells from initial_position to destination, in the same
+            order dijkstras_shortest_path returns. Otherwise, return None.
+        """
+        index = self.index
+        source = index.get(initial_position)
+        target = index.get(destination)
+        if source is None or target is None:
+            return [initial_position] if initial_position == destination else None
+
+        offsets = self.offsets
+        targets = self.targets
+        weights = self.weights
+
+        # forward search from the source, backward search from the target, both over upward edges only
+        costs = ({source: 0}, {target: 0})
+        came_from = ({source: None}, {target: None})
+        queues = ([(0, source)], [(0, target)])
+        best = inf
+        meeting = None
+
+        while queues[0] or queues[1]:
+            # advance whichever search has the cheaper next cell; stop once neither can beat the best meeting
+            top = [queue[0][0] if queue else inf for queue in queues]
+            if min(top) >= best:
+                break
+            side = 0 if top[0] <= top[1] else 1
+            current_cost, u = heappop(queues[side])
+            cost_so_far = costs[side]
+            if current_cost > cost_so_far[u]:  # stale queue entry
+                continue
+
+            other = costs[1 - side].get(u)
+            if other is not None and current_cost + other < best:
+                best = current_cost + other
+                meeting = u
+
+            for e in range(offsets[u], offsets[u + 1]):
+                v = targets[e]
+                pathCost = weights[e] + current_cost
+                if pathCost < cost_so_far.get(v, inf):
+                    cost_so_far[v] = pathCost
+                    came_from[side][v] = (u, e)
+                    heappush(queues[side], (pathCost, v))
+
+        if meeting is None:
+            return None
+
+        # walk both searches back to the meeting cell, giving the route from source to target over hierarchy edges
+        route = []
+        node = meeting
+        while came_from[0][node] is not None:
+            node, e = came_from[0][node]
+            route.append((node, e, False))
+        route.reverse()
+        node = meeting
+        while came_from[1][node] is not None:
+            parent, e = came_from[1][node]
+            route.append((parent, e, True))
+            node = parent
+
+        path = [source]
+        for u, e, backward in route:
+            if backward:
+                # the edge was stored on the cell the backward search came from, so it is walked from its target
+                self._unpack(targets[e], u, e, path)
+            else:
+                self._unpack(u, targets[e], e, path)
+
+        cells = self.cells
+        return [cells[u] for u in reversed(path)]
+
+    def _unpack(self, a, b, e, path):
+        # appends the cells after a up to b of hierarchy edge e (from a to b, stored on either end) to path
+        middles = self.middles
+        stack = [(a, b, e)]
+        while stack:
+            a, b, e = stack.pop()
+            m = middles[e]
+            if m == -1:
+                path.append(b)
+                continue
+            # the bypassed cell was contracted first, so both halves are upward edges stored on it
+            stack.append((m, b, self._edge(m, b)))
+            stack.append((a, m, self._edge(m, a)))
+
+    def _edge(self, u, v):
+        # position of the upward edge from u to v
+        targets = self.targets
+        for e in range(self.offsets[u], self.offsets[u + 1]):
+            if targets[e] == v:
+                return e
+        raise KeyError((u, v))
+
+
+def build_contraction_hierarchy(level, adj=navigation_edges):
+    """ Contracts every cell of a level into a ContractionHierarchy.
+
+    Cells are contracted cheapest first, by the number of shortcuts contracting them would add minus the edges it
+    would remove, plus how many of their neighbors are already contracted so contraction spreads evenly over the
+    level. Priorities are only recomputed when a cell reaches the front of the queue. A shortcut is skipped when a
+    local witness search finds a path around the cell that is no more expensive.
+
+    Args:
+        level: A loaded level, containing walls, spaces, and waypoints.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+
+    Returns:
+        The ContractionHierarchy for the level.
+    """
+    cells = sorted(level['spaces'])
+    index = {cell: i for i, cell in enumerate(cells)}
+    n = len(cells)
+
+    # remaining graph: graph[u][v] = (cost, bypassed cell or -1)
+    graph = [{} for _ in range(n)]
+    for u, cell in enumerate(cells):
+        edges = graph[u]
+        for new_node, cost in adj(level, cell):
+            v = index.get(new_node)
+            if v is not None and v != u and cost < edges.get(v, (inf,))[0]:
+                edges[v] = (cost, -1)
+
+    deleted = [0] * n
+    priorityQ = [(_priority(graph, v, deleted), v) for v in range(n)]
+    priorityQ.sort()
+    upward = [None] * n
+
+    while priorityQ:
+        _, v = heappop(priorityQ)
+        shortcuts = _shortcuts(graph, v)
+        priority = len(shortcuts) - len(graph[v]) + deleted[v]
+        if priorityQ and priority > priorityQ[0][0]:
+            heappush(priorityQ, (priority, v))
+            continue
+
+        edges = graph[v]
+        upward[v] = edges
+        for u in edges:
+            del graph[u][v]
+            deleted[u] += 1
+        for u, w, cost in shortcuts:
+            if cost < graph[u].get(w, (inf,))[0]:
+                graph[u][w] = (cost, v)
+                graph[w][u] = (cost, v)
+        graph[v] = None
+
+    offsets = array('l', [0])
+    targets = array('l')
+    weights = array('d')
+    middles = array('l')
+    for edges in upward:
+        for v, (cost, middle) in sorted(edges.items()):
+            targets.append(v)
+            weights.append(cost)
+            middles.append(middle)
+        offsets.append(len(targets))
+
+    return ContractionHierarchy(cells, offsets, targets, weights, middles, level_fingerprint(level))
+
+
+def _priority(graph, v, deleted):
+    # edge difference of contracting v, plus its contracted neighbors
+    return len(_shortcuts(graph, v)) - len(graph[v]) + deleted[v]
+
+
+def _shortcuts(graph, v):
+    # the (u, w, cost) shortcuts contracting v would need, one per unordered pair of its neighbors
+    neighbors = list(graph[v].items())
+    shortcuts = []
+    for i, (u, (to_u, _)) in enumerate(neighbors):
+        others = neighbors[i + 1:]
+        if not others:
+            break
+        limit = to_u + max(to_w for _, (to_w, _) in others)
+        witness = _witness_search(graph, u, v, limit)
+        for w, (to_w, _) in others:
+            if witness.get(w, inf) > to_u + to_w:
+                shortcuts.append((u, w, to_u + to_w))
+    return shortcuts
+
+
+def _witness_search(graph, source, skip, limit):
+    # costs from source without passing through skip, up to limit or WITNESS_LIMIT settled cells
+    cost_so_far = {source: 0}
+    priorityQ = [(0, source)]
+    settled = 0
+    while priorityQ:
+        current_cost, u = heappop(priorityQ)
+        if current_cost > cost_so_far[u]:  # stale queue entry
+            continue
+        if current_cost > limit or settled == WITNESS_LIMIT:
+            break
+        settled += 1
+        for v, (cost, _) in graph[u].items():
+            if v == skip:
+                continue
+            pathCost = cost + current_cost
+            if pathCost < cost_so_far.get(v, inf):
+                cost_so_far[v] = pathCost
+                heappush(priorityQ, (pathCost, v))
+    return cost_so_far
+
+
+def save_contraction_hierarchy(hierarchy, filename):
+    """ Saves a contraction hierarchy so it can be reused with load_contraction_hierarchy. """
+    hierarchy._load()
+    with open(filename, 'wb') as f:
+        pickle.dump({'cells': hierarchy.cells,
+                     'offsets': hierarchy.offsets,
+                     'targets': hierarchy.targets,
+                     'weights': hierarchy.weights,
+                     'middles': hierarchy.middles,
+                     'fingerprint': hierarchy.fingerprint}, f, pickle.HIGHEST_PROTOCOL)
+
+
+def load_contraction_hierarchy(filename, level):
+    """ Loads a contraction hierarchy saved by save_contraction_hierarchy for level.
+
+    The file is only read on the first query, so a server can set up hierarchies for many levels up front and
+    only pay for the ones it uses.
+
+    Raises:
+        ValueError: On the first query, if the level's walls or spaces differ from the ones the hierarchy was
+            built from.
+    """
+    hierarchy = ContractionHierarchy(None, None, None, None, None, None)
+    hierarchy._source = (filename, level)
+    return hierarchy
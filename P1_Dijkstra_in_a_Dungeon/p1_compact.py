@@ -0,0 +1,232 @@
+# Compact search state for P1
+
+from array import array
+from collections.abc import Mapping
+from math import inf
+from time import perf_counter
+
+from p1_queues import make_queue
+from p1_support import level_bounds
+
+
+class CellIds:
+    """ Numbers every cell in a level's bounding box, column by column.
+
+    Numbering by column then row keeps cell numbers in the same order as (x, y) tuples, so searches that keep
+    their state in arrays indexed by cell number break ties exactly as the dict-based searches do.
+    """
+
+    def __init__(self, level):
+        self.x_lo, x_hi, self.y_lo, y_hi = level_bounds(level)
+        self.height = y_hi - self.y_lo + 1
+        self.size = (x_hi - self.x_lo + 1) * self.height
+
+    def id(self, cell):
+        """ Returns the number of a cell, or None if it lies outside the bounding box. """
+        i = (cell[0] - self.x_lo) * self.height + cell[1] - self.y_lo
+        if 0 <= cell[1] - self.y_lo < self.height and 0 <= i < self.size:
+            return i
+        return None
+
+    def cell(self, i):
+        """ Returns the cell with number i. """
+        x, y = divmod(i, self.height)
+        return x + self.x_lo, y + self.y_lo
+
+
+class CompactCosts(Mapping):
+    """ A read-only dict-like view of the costs found by compact_shortest_path_to_all.
+
+    Attributes:
+        ids: The CellIds numbering the arrays.
+        costs: An array('d') with the cost of every reached cell by cell number.
+        parents: An array('i') (int32) with the number of the cell each reached cell was reached from, -1 for the
+            initial position and unreached cells.
+        visited: A bitset (bytearray) with bit i set if cell number i was reached.
+    """
+
+    def __init__(self, ids, costs, parents, visited):
+        self.ids = ids
+        self.costs = costs
+        self.parents = parents
+        self.visited = visited
+
+    def _reached(self, i):
+        return i is not None and self.visited[i >> 3] & (1 << (i & 7))
+
+    def __getitem__(self, cell):
+        i = self.ids.id(cell)
+        if not self._reached(i):
+            raise KeyError(cell)
+        if self.parents[i] == -1:  # the initial position, stored as 0 like the dict version does
+            return 0
+        return self.costs[i]
+
+    def __contains__(self, cell):
+        return bool(self._reached(self.ids.id(cell)))
+
+    def __iter__(self):
+        cell = self.ids.cell
+        for byte, bits in enumerate(self.visited):
+            if bits:
+                for bit in range(8):
+                    if bits & (1 << bit):
+                        yield cell((byte << 3) | bit)
+
+    def __len__(self):
+        return sum(bin(bits).count('1') for bits in self.visited)
+
+    def path(self, destination):
+        """ Rebuilds the path to destination in the order dijkstras_shortest_path returns, or None if unreached. """
+        i = self.ids.id(destination)
+        if not self._reached(i):
+            return None
+        return _path(self.ids, self.parents, i)
+
+
+def _path(ids, parents, i):
+    # follows the parent array from cell number i back to the initial position
+    path = []
+    while i != -1:
+        path.append(ids.cell(i))
+        i = parents[i]
+    return path
+
+
+def _state(ids):
+    # cost, parent and visited arrays for every cell number
+    return array('d', [inf]) * ids.size, array('i', [-1]) * ids.size, bytearray((ids.size + 7) >> 3)
+
+
+def compact_shortest_path(initial_position, destination, graph, adj, heuristic=None, queue='heap', stats=None):
+    """ Runs dijkstras_shortest_path with its state in flat arrays instead of dictionaries.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        destination: The end location for the path.
+        graph: A loaded level, containing walls, spaces, and waypoints.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+        heuristic: An optional A* heuristic, as for dijkstras_shortest_path.
+        queue: The priority queue to use, 'heap' or 'bucket'.
+        stats: An optional SearchStats to fill in.
+
+    Returns:
+        If a path exits, return a list containing all cells from initial_position to destination.
+        Otherwise, return None.
+    """
+    ids = CellIds(graph)
+    cost_so_far, came_from, visited = _state(ids)
+    cell_id = ids.id
+    source = cell_id(initial_position)
+    if source is None:
+        return [initial_position] if initial_position == destination else None
+    cost_so_far[source] = 0.
+    expanded = 0
+
+    # assembling queue
+    priorityQ, push, pop = make_queue(queue, lambda: min(graph['spaces'].values()))
+    if stats is not None:
+        push, pop = stats.wrap_queue(priorityQ, push, pop)
+        adj = stats.wrap_adj(adj)
+        start = perf_counter()
+    push((0, initial_position))
+
+    while priorityQ:
+        current_priority, current_node = pop()
+        u = cell_id(current_node)
+
+        if visited[u >> 3] & (1 << (u & 7)):  # stale queue entry
+            continue
+        visited[u >> 3] |= 1 << (u & 7)
+        expanded += 1
+        current_cost = cost_so_far[u]
+
+        if current_node == destination:
+            if stats is not None:
+                stats.add_time('search', start)
+                stats.finish(expanded)
+                start = perf_counter()
+            print("Total cost = ", current_cost, '\n')
+            print("Nodes expanded = ", expanded, '\n')
+            path = _path(ids, came_from, u)
+            if stats is not None:
+                stats.add_time('path', start)
+            return path
+
+        for new_node, new_cost in adj(graph, current_node):
+            v = cell_id(new_node)
+            pathCost = new_cost + current_cost
+            if pathCost < cost_so_far[v]:
+                cost_so_far[v] = pathCost
+                priority = pathCost if heuristic is None else pathCost + heuristic(new_node)
+                push((priority, new_node))
+                came_from[v] = u
+
+    if stats is not None:
+        stats.add_time('search', start)
+        stats.finish(expanded)
+    return None
+
+
+def compact_shortest_path_to_all(initial_position, graph, adj, parents=None, queue='heap', stats=None):
+    """ Runs dijkstras_shortest_path_to_all with its state in flat arrays instead of dictionaries.
+
+    The state takes 12 bytes and a bit (a float64 cost, an int32 parent and a visited bit) per cell of the level's
+    bounding box, against a few hundred bytes per reached cell in the two dictionaries.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        graph: A loaded level, containing walls, spaces, and waypoints.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+        parents: An optional dictionary to fill with the back pointer of every reached cell. CompactCosts.path
+            rebuilds paths without it.
+        queue: The priority queue to use, 'heap' or 'bucket'.
+        stats: An optional SearchStats to fill in.
+
+    Returns:
+        A CompactCosts view mapping destination cells to the cost of a path from the initial_position.
+    """
+    ids = CellIds(graph)
+    cost_so_far, came_from, visited = _state(ids)
+    cell_id = ids.id
+    source = cell_id(initial_position)
+    if source is None:
+        if parents is not None:
+            parents[initial_position] = None
+        return {initial_position: 0}
+    cost_so_far[source] = 0.
+    expanded = 0
+
+    # assembling queue
+    priorityQ, push, pop = make_queue(queue, lambda: min(graph['spaces'].values()))
+    if stats is not None:
+        push, pop = stats.wrap_queue(priorityQ, push, pop)
+        adj = stats.wrap_adj(adj)
+        start = perf_counter()
+    push((0, initial_position))
+
+    while priorityQ:
+        current_cost, current_node = pop()
+        u = cell_id(current_node)
+        if current_cost > cost_so_far[u]:  # stale queue entry
+            continue
+        visited[u >> 3] |= 1 << (u & 7)
+        expanded += 1
+
+        for new_node, new_cost in adj(graph, current_node):
+            v = cell_id(new_node)
+            pathCost = new_cost + current_cost
+            if pathCost < cost_so_far[v]:
+                cost_so_far[v] = pathCost
+                push((pathCost, new_node))
+                came_from[v] = u
+
+    if stats is not None:
+        stats.add_time('search', start)
+        stats.finish(expanded)
+
+    costs = CompactCosts(ids, cost_so_far, came_from, visited)
+    if parents is not None:
+        parents.update((cell, ids.cell(came_from[cell_id(cell)]) if came_from[cell_id(cell)] != -1 else None)
+                       for cell in costs)
+    return costs
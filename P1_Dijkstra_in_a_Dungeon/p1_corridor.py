@@ -0,0 +1,162 @@
+# Corridor compression for P1
+
+from heapq import heappop, heappush
+
+from p1 import navigation_edges
+
+
+class CorridorGraph:
+    """ A level with every corridor, a chain of cells with exactly two neighbors, collapsed into one weighted edge.
+
+    Cells with any other number of neighbors are junctions. Each junction keeps one edge per corridor leaving it,
+    leading to the junction at the corridor's far end, with the corridor's total cost and its cells, so searches
+    cross a whole corridor in a single queue push and only spell out the cells of the path they return.
+
+    Attributes:
+        edges: A dictionary mapping each junction to a list of (junction, cost, cells) edges, cells being the
+            corridor cells between the two junctions in walking order.
+        links: A dictionary mapping each corridor cell to its two (neighbor, edge cost) pairs.
+    """
+
+    def __init__(self, edges, links):
+        self.edges = edges
+        self.links = links
+
+    def _walk(self, start, first, cost, stop=None):
+        # follows a corridor from start through its neighbor first, returning the cell where it ends (a junction or
+        # stop), the cost of getting there and the corridor cells passed on the way
+        links = self.links
+        cells = []
+        prev, curr = start, first
+        while curr in links and curr != stop:
+            cells.append(curr)
+            (a, to_a), (b, to_b) = links[curr]
+            if a != prev:
+                prev, curr, cost = curr, a, cost + to_a
+            else:
+                prev, curr, cost = curr, b, cost + to_b
+        return curr, cost, cells
+
+    def _entry_edges(self, cell, stop):
+        # edges from a corridor cell to the ends of its corridor, or to stop if it lies on the way
+        return [self._walk(cell, neighbor, cost, stop) for neighbor, cost in self.links[cell]]
+
+    def shortest_path(self, initial_position, destination):
+        """ Searches for a minimal cost path over junctions and corridor edges.
+
+        Args:
+            initial_position: The initial cell from which the path extends.
+            destination: The end location for the path.
+
+        Returns:
+            If a path exits, return a list containing all cells from initial_position to destination, in the same
+            order dijkstras_shortest_path returns. Otherwise, return None.
+        """
+        edges = self.edges
+        links = self.links
+        if initial_position == destination:
+            return [initial_position]
+        if not (initial_position in edges or initial_position in links) or not (
+                destination in edges or destination in links):
+            return None
+
+        # a corridor endpoint joins the search as an extra node with edges to the ends of its corridor
+        source_edges = self._entry_edges(initial_position, destination) if initial_position in links else None
+        target_edges = {}
+        if destination in links:
+            for junction, cost, cells in self._entry_edges(destination, initial_position):
+                # a corridor joining both endpoints was already added from the source's side
+                # both ends of the corridor may lead to the same junction; only the cheaper way can be shortest
+                if (junction != initial_position or source_edges is None) and (
+                        junction not in target_edges or cost < target_edges[junction][0]):
+                    target_edges[junction] = (cost, cells[::-1])
+
+        # assembling queue on heap
+        priorityQ = [(0, initial_position)]
+
+        # back pointer, with the corridor cells crossed to get there
+        came_from = {initial_position: None}
+
+        # keeps track of cost
+        cost_so_far = {initial_position: 0}
+
+        # nodes that have already been expanded
+        closed = set()
+
+        while priorityQ:
+            current_cost, current_node = heappop(priorityQ)
+
+            if current_node in closed:  # stale queue entry
+                continue
+            closed.add(current_node)
+
+            if current_node == destination:
+                print("Total cost = ", current_cost, '\n')
+                print("Nodes expanded = ", len(closed), '\n')
+                return _expand_corridors(current_node, came_from)
+
+            if current_node == initial_position and source_edges is not None:
+                out = source_edges
+            else:
+                out = edges[current_node]
+            if current_node in target_edges:
+                out = out + [(destination,) + target_edges[current_node]]
+
+            for new_node, new_cost, cells in out:
+                pathCost = new_cost + current_cost
+                if new_node not in cost_so_far or pathCost < cost_so_far[new_node]:
+                    cost_so_far[new_node] = pathCost
+                    heappush(priorityQ, (pathCost, new_node))
+                    came_from[new_node] = (current_node, cells)
+        return None
+
+
+def _expand_corridors(destination, came_from):
+    # spells out the corridor cells between consecutive nodes of the path
+    path = [destination]
+    curr = destination
+    while came_from[curr] != None:
+        parent, cells = came_from[curr]
+        path.extend(reversed(cells))
+        path.append(parent)
+        curr = parent
+    return path
+
+
+def compress_corridors(level, adj=navigation_edges):
+    """ Collapses the corridors of a level into a CorridorGraph.
+
+    Args:
+        level: A loaded level, containing walls, spaces, and waypoints.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+            Edge costs must be symmetric, as they are for navigation_edges.
+
+    Returns:
+        The CorridorGraph for the level.
+    """
+    neighbors = {cell: adj(level, cell) for cell in level['spaces']}
+    links = {cell: tuple(out) for cell, out in neighbors.items() if len(out) == 2}
+    graph = CorridorGraph({cell: [] for cell in neighbors if cell not in links}, links)
+
+    def connect(junction):
+        for neighbor, cost in neighbors[junction]:
+            end, total, cells = graph._walk(junction, neighbor, cost)
+            if end != junction:  # a corridor looping back is never on a shortest path
+                graph.edges[junction].append((end, total, cells))
+
+    for junction in list(graph.edges):
+        connect(junction)
+
+    # corridors closing on themselves, with or without a junction, get one, so walks along them always end; the
+    # junctions at the far ends, whose walks over the loop were dropped, get the reverse edges
+    reached = {cell for out in graph.edges.values() for _, _, cells in out for cell in cells}
+    for cell in sorted(links):
+        if cell not in reached:
+            del links[cell]
+            graph.edges[cell] = []
+            connect(cell)
+            for end, total, cells in graph.edges[cell]:
+                graph.edges[end].append((cell, total, cells[::-1]))
+                reached.update(cells)
+
+    return graph
@@ -0,0 +1,151 @@
+# Route query daemon for P1
+
+from argparse import ArgumentParser
+from signal import SIGTERM, signal
+from socketserver import StreamRequestHandler, ThreadingUnixStreamServer
+import json
+import os
+import sys
+
+from p1 import dijkstras_shortest_path, dijkstras_shortest_path_to_all, navigation_edges, path_cost
+from p1_graph import compile_level
+from p1_support import load_level
+
+
+def load_levels(filenames):
+    """ Loads and compiles levels to keep resident.
+
+    Args:
+        filenames: The names of the text files containing the levels.
+
+    Returns:
+        A dictionary mapping each level's name, its filename without directory or extension, to its CompiledGraph.
+    """
+    return {os.path.splitext(os.path.basename(filename))[0]: compile_level(load_level(filename))
+            for filename in filenames}
+
+
+def _position(graph, value):
+    # a waypoint character or an [x, y] pair
+    if isinstance(value, str):
+        if value not in graph['waypoints']:
+            raise ValueError('unknown waypoint ' + repr(value))
+        return graph['waypoints'][value]
+    x, y = value
+    if type(x) is not int or type(y) is not int:
+        raise ValueError('positions must be a waypoint or an [x, y] pair of integers, not ' + repr(value))
+    return x, y
+
+
+def handle_request(levels, request):
+    """ Answers one query.
+
+    Requests are dictionaries with an 'op', a 'level' name and positions given as a waypoint character or an
+    [x, y] pair. An optional 'id' is echoed back.
+
+    - {"op": "route", "level": ..., "src": ..., "dst": ...} answers with "path", the cells from dst back to src as
+      dijkstras_shortest_path returns them, and its "cost", both null when there is no path.
+    - {"op": "costs", "level": ..., "src": ...} answers with "costs", a list of [x, y, cost] for every reachable
+      cell, or only for the cells listed in an optional "cells". An optional "max_cost" or "max_cells" bounds the
+      search as for dijkstras_shortest_path_to_all.
+
+    Args:
+        levels: A dictionary of resident levels, from load_levels.
+        request: The decoded request.
+
+    Returns:
+        The response dictionary; failed requests get an "error" message instead of a result.
+    """
+    response = {}
+    try:
+        if not isinstance(request, dict):
+            raise ValueError('request must be a JSON object')
+        if 'id' in request:
+            response['id'] = request['id']
+        if request.get('level') not in levels:
+            raise ValueError('unknown level ' + repr(request.get('level')))
+        graph = levels[request['level']]
+        src = _position(graph, request.get('src'))
+
+        op = request.get('op')
+        if op == 'route':
+            dst = _position(graph, request.get('dst'))
+            path = dijkstras_shortest_path(src, dst, graph, navigation_edges)
+            response['path'] = path
+            response['cost'] = path_cost(graph, path, navigation_edges) if path else None
+        elif op == 'costs':
+            costs = dijkstras_shortest_path_to_all(src, graph, navigation_edges, max_cost=request.get('max_cost'),
+                                                   max_cells=request.get('max_cells'))
+            if 'cells' in request:
+                cells = [_position(graph, cell) for cell in request['cells']]
+                response['costs'] = [[x, y, costs[(x, y)]] for x, y in cells if (x, y) in costs]
+            else:
+                response['costs'] = [[x, y, cost] for (x, y), cost in costs.items()]
+        else:
+            raise ValueError('unknown op ' + repr(op))
+    except (ValueError, TypeError, KeyError, OverflowError) as error:
+        response['error'] = str(error)
+    return response
+
+
+def handle_line(levels, line):
+    """ Answers one newline-delimited JSON request, given as text or UTF-8 bytes, with one line of JSON. """
+    try:
+        request = json.loads(line)
+    except ValueError as error:  # UnicodeDecodeError included
+        return json.dumps({'error': 'invalid JSON: ' + str(error)}) + '\n'
+    return json.dumps(handle_request(levels, request)) + '\n'
+
+
+def serve_stdin(levels, stdin, stdout):
+    """ Answers requests read line by line from stdin until it closes. """
+    for line in stdin:
+        if line.strip():
+            stdout.write(handle_line(levels, line))
+            stdout.flush()
+
+
+class _RequestHandler(StreamRequestHandler):
+    # one thread per client, answering its requests in order
+
+    def handle(self):
+        for line in self.rfile:
+            if line.strip():
+                self.wfile.write(handle_line(self.server.levels, line).encode())
+                self.wfile.flush()
+
+
+def serve_socket(levels, path):
+    """ Answers requests from any number of clients connecting to a Unix socket at path, until interrupted. """
+    if os.path.exists(path):
+        os.remove(path)
+    with ThreadingUnixStreamServer(path, _RequestHandler) as server:
+        server.daemon_threads = True
+        server.levels = levels
+        try:
+            server.serve_forever()
+        finally:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser(description='Answer newline-delimited JSON route queries on resident levels.')
+    parser.add_argument('levels', nargs='+', help='level files to preload, named by their filename stem')
+    parser.add_argument('--socket', help='serve on this Unix socket instead of stdin and stdout')
+    args = parser.parse_args()
+
+    levels = load_levels(args.levels)
+
+    # the searches print their totals; keep them out of the responses, which go to the real stdout
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+
+    if args.socket:
+        # exit through serve_socket's cleanup when stopped
+        signal(SIGTERM, lambda signum, frame: sys.exit(0))
+        try:
+            serve_socket(levels, args.socket)
+        except KeyboardInterrupt:
+            pass
+    else:
+        serve_stdin(levels, sys.stdin, stdout)
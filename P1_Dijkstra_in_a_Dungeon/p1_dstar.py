@@ -0,0 +1,155 @@
+# Incremental replanning (D* Lite) for P1
+
+from heapq import heappop, heappush
+from math import inf
+
+from p1 import navigation_edges, octile_heuristic
+from p1_support import WALL
+
+# keys closer than this are treated as equal, so ties that rounding splits still count as ties
+KEY_TOLERANCE = 1e-9
+
+
+class DStarLite:
+    """ An incremental shortest path planner over a level, following Koenig and Likhachev's D* Lite.
+
+    The planner searches backward from the goal, so when cells change cost or turn into walls only the part of
+    the search tree the edit touches is repaired. The start may move along the path between edits.
+
+    Attributes:
+        level: The level being planned over; update() edits its walls and spaces in place.
+        start: The current start cell.
+        goal: The goal cell.
+        expanded: The number of cells expanded since the planner was created.
+    """
+
+    def __init__(self, level, start, goal, adj=navigation_edges):
+        self.level = level
+        self.start = start
+        self.goal = goal
+        self.adj = adj
+        self.expanded = 0
+        self._reset()
+
+    def _reset(self):
+        # octile_heuristic estimates the cost to the cell it is built for, and the graph is undirected
+        self._min_cost = min(self.level['spaces'].values())
+        self._heuristic = octile_heuristic(self.level, self.start, self._min_cost)
+        self._km = 0
+        self._g = {}
+        self._rhs = {self.goal: 0}
+        self._queue = []
+        self._queued = {}
+        self._push(self.goal)
+
+    def _calculate_key(self, cell):
+        best = min(self._g.get(cell, inf), self._rhs.get(cell, inf))
+        return best + self._heuristic(cell) + self._km, best
+
+    @staticmethod
+    def _key_less(a, b):
+        # a < b, with keys within KEY_TOLERANCE of each other treated as equal
+        if a[0] < b[0] - KEY_TOLERANCE:
+            return True
+        return abs(a[0] - b[0]) <= KEY_TOLERANCE and a[1] < b[1] - KEY_TOLERANCE
+
+    def _push(self, cell):
+        key = self._calculate_key(cell)
+        self._queued[cell] = key
+        heappush(self._queue, (key, cell))
+
+    def _top_key(self):
+        # drop entries for cells that were removed or re-queued with another key
+        while self._queue and self._queued.get(self._queue[0][1]) != self._queue[0][0]:
+            heappop(self._queue)
+        return self._queue[0][0] if self._queue else (inf, inf)
+
+    def _update_vertex(self, cell):
+        if cell != self.goal:
+            self._rhs[cell] = min((cost + self._g.get(neighbor, inf) for neighbor, cost in self.adj(self.level, cell)),
+                                  default=inf)
+        self._queued.pop(cell, None)
+        if self._g.get(cell, inf) != self._rhs.get(cell, inf):
+            self._push(cell)
+
+    def _compute_shortest_path(self):
+        # keeps going through entries tied with the start, whose order rounding may have flipped
+        while (not self._key_less(self._calculate_key(self.start), self._top_key()) or
+               self._rhs.get(self.start, inf) != self._g.get(self.start, inf)):
+            if self._top_key()[0] == inf:  # nothing left to repair
+                break
+            old_key, cell = heappop(self._queue)
+            del self._queued[cell]
+            self.expanded += 1
+
+            if self._key_less(old_key, self._calculate_key(cell)):
+                self._push(cell)
+            elif self._g.get(cell, inf) > self._rhs.get(cell, inf):
+                self._g[cell] = self._rhs[cell]
+                for neighbor, _ in self.adj(self.level, cell):
+                    self._update_vertex(neighbor)
+            else:
+                self._g[cell] = inf
+                self._update_vertex(cell)
+                for neighbor, _ in self.adj(self.level, cell):
+                    self._update_vertex(neighbor)
+
+    def cost(self):
+        """ Returns the cost of the current shortest path from start to goal, inf if there is none. """
+        self._compute_shortest_path()
+        return self._g.get(self.start, inf)
+
+    def path(self):
+        """ Returns the current shortest path, in the same order dijkstras_shortest_path returns, or None.
+
+        Raises:
+            RuntimeError: If following the costs leads around in a cycle instead of to the goal.
+        """
+        if self.cost() == inf:
+            return None
+
+        path = [self.start]
+        seen = {self.start}
+        cell = self.start
+        while cell != self.goal:
+            cell = min(self.adj(self.level, cell), key=lambda edge: edge[1] + self._g.get(edge[0], inf))[0]
+            if cell in seen:
+                raise RuntimeError('Error: the path from ' + str(self.start) + ' loops back to ' + str(cell) + '.')
+            seen.add(cell)
+            path.append(cell)
+        path.reverse()
+        return path
+
+    def move_to(self, cell):
+        """ Moves the start to a new cell, typically the next one along the current path. """
+        self._km += self._heuristic(cell)
+        self.start = cell
+        # keep the scale update() checks edits against, and skip rescanning the level
+        self._heuristic = octile_heuristic(self.level, cell, self._min_cost)
+
+    def update(self, changes):
+        """ Applies edits to the level and repairs the search around them.
+
+        Args:
+            changes: A dictionary mapping cells to their new cost, or to WALL to turn them into walls.
+        """
+        walls = self.level['walls']
+        spaces = self.level['spaces']
+
+        affected = set()
+        for (x, y), value in changes.items():
+            if value == WALL:
+                walls.add((x, y))
+            else:
+                walls.discard((x, y))
+                spaces[(x, y)] = float(value)
+            affected.update((a, b) for a in range(x - 1, x + 2) for b in range(y - 1, y + 2))
+
+        if any(value != WALL and value < self._min_cost for value in changes.values()):
+            # a cheaper cell makes the heuristic overestimate, so start over with a rescaled one
+            self._reset()
+            return
+
+        for cell in affected:
+            if cell in walls or cell in spaces:
+                self._update_vertex(cell)
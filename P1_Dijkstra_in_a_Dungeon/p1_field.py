@@ -0,0 +1,105 @@
+# Array-backed cost fields for P1
+
+from array import array
+from heapq import heappop, heappush
+from math import inf
+from operator import add
+
+from p1_support import HALF_DIAGONAL
+
+
+def distance_field(level, initial_position):
+    """ Calculates the minimum cost to every cell of a GridLevel from the initial_position.
+
+    The level is flattened into a padded cost grid and the edge costs toward each neighbor are precomputed for
+    the whole grid at once, so the search itself only moves integer indices and floats: neighbors are fixed index
+    offsets and no coordinate tuples or dictionaries are touched. Edge costs follow navigation_edges, so the
+    costs match dijkstras_shortest_path_to_all.
+
+    Args:
+        level: A GridLevel.
+        initial_position: The initial cell from which the costs are measured.
+
+    Returns:
+        An array('d') with one cost per cell in flat index order, inf for unreachable cells, which
+        save_level_costs can write directly.
+    """
+    width, height = level.width, level.height
+
+    # pad with a border of blocked cells so every real cell has all eight neighbors
+    w = width + 2
+    n = w * (height + 2)
+    costs = [inf] * n
+    cell_costs = level.cell_costs()
+    for j in range(height):
+        costs[(j + 1) * w + 1:(j + 1) * w + 1 + width] = cell_costs[j * width:(j + 1) * width]
+
+    # edge costs from each cell to its east, south, south-east and south-west neighbors
+    half = [0.5 * cost for cost in costs]
+    half_diagonal = [HALF_DIAGONAL * cost for cost in costs]
+    east = list(map(add, half, half[1:] + [inf]))
+    south = list(map(add, half, half[w:] + [inf] * w))
+    south_east = list(map(add, half_diagonal, half_diagonal[w + 1:] + [inf] * (w + 1)))
+    south_west = list(map(add, half_diagonal, half_diagonal[w - 1:] + [inf] * (w - 1)))
+
+    field = [inf] * n
+    x, y = initial_position
+    if level.index(initial_position) is None or costs[(y + 1) * w + x + 1] == inf:
+        return array('d', [inf]) * (width * height)
+    source = (y + 1) * w + x + 1
+    field[source] = 0.
+
+    # assembling queue on heap
+    priorityQ = [(0., source)]
+
+    while priorityQ:
+        current_cost, u = heappop(priorityQ)
+        if current_cost > field[u]:  # stale queue entry
+            continue
+
+        # the eight neighbors, each with the edge cost stored on the cell that owns the edge
+        v = u + 1
+        pathCost = east[u] + current_cost
+        if pathCost < field[v]:
+            field[v] = pathCost
+            heappush(priorityQ, (pathCost, v))
+        v = u - 1
+        pathCost = east[u - 1] + current_cost
+        if pathCost < field[v]:
+            field[v] = pathCost
+            heappush(priorityQ, (pathCost, v))
+        v = u + w
+        pathCost = south[u] + current_cost
+        if pathCost < field[v]:
+            field[v] = pathCost
+            heappush(priorityQ, (pathCost, v))
+        v = u - w
+        pathCost = south[u - w] + current_cost
+        if pathCost < field[v]:
+            field[v] = pathCost
+            heappush(priorityQ, (pathCost, v))
+        v = u + w + 1
+        pathCost = south_east[u] + current_cost
+        if pathCost < field[v]:
+            field[v] = pathCost
+            heappush(priorityQ, (pathCost, v))
+        v = u - w - 1
+        pathCost = south_east[u - w - 1] + current_cost
+        if pathCost < field[v]:
+            field[v] = pathCost
+            heappush(priorityQ, (pathCost, v))
+        v = u + w - 1
+        pathCost = south_west[u] + current_cost
+        if pathCost < field[v]:
+            field[v] = pathCost
+            heappush(priorityQ, (pathCost, v))
+        v = u - w + 1
+        pathCost = south_west[u - w + 1] + current_cost
+        if pathCost < field[v]:
+            field[v] = pathCost
+            heappush(priorityQ, (pathCost, v))
+
+    result = array('d')
+    for j in range(height):
+        result.extend(field[(j + 1) * w + 1:(j + 1) * w + 1 + width])
+    return result
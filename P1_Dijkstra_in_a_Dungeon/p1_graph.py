@@ -0,0 +1,278 @@
+# Compiled graph support for P1
+
+from array import array
+from math import inf
+from time import perf_counter
+
+from p1_queues import make_queue
+from p1_support import HALF_DIAGONAL
+
+
+class CompiledGraph:
+    """ A level compiled once into a compressed sparse row (CSR) adjacency structure.
+
+    Cells are numbered in sorted coordinate order, so ties in the priority queue break the same way they do for
+    coordinate tuples. The edges of cell id u are neighbors[offsets[u]:offsets[u + 1]] with the matching costs in
+    weights, in the order navigation_edges would produce them.
+
+    Indexing the graph like a dict (graph['waypoints'], graph['spaces'], ...) reads through to the source level,
+    so it can be handed to show_level and save_level_costs directly.
+    """
+
+    def __init__(self, level, cells, index, offsets, neighbors, weights):
+        self.level = level
+        self.cells = cells
+        self.index = index
+        self.offsets = offsets
+        self.neighbors = neighbors
+        self.weights = weights
+
+    def __getitem__(self, key):
+        return self.level[key]
+
+    def __len__(self):
+        return len(self.cells)
+
+
+def compile_level(level):
+    """ Compiles a loaded level into a CompiledGraph.
+
+    Args:
+        level: A loaded level, containing walls, spaces, and waypoints.
+
+    Returns:
+        The CompiledGraph holding the level's cells and precomputed edge costs.
+    """
+    walls = level['walls']
+    spaces = level['spaces']
+
+    cells = sorted(spaces)
+    index = {cell: i for i, cell in enumerate(cells)}
+
+    offsets = array('l', [0])
+    neighbors = array('l')
+    weights = array('d')
+
+    for x, y in cells:
+        cost = spaces[(x, y)]
+        for a in range(x - 1, x + 2):
+            for b in range(y - 1, y + 2):
+                if (a, b) in walls or (a, b) == (x, y) or (a, b) not in spaces:
+                    continue
+                if a != x and b != y:  # diagonal
+                    weights.append((HALF_DIAGONAL * spaces[(a, b)]) + (HALF_DIAGONAL * cost))
+                else:
+                    weights.append((0.5 * spaces[(a, b)]) + (0.5 * cost))
+                neighbors.append(index[(a, b)])
+        offsets.append(len(neighbors))
+
+    return CompiledGraph(level, cells, index, offsets, neighbors, weights)
+
+
+def compiled_shortest_path(initial_position, destination, graph, heuristic=None, queue='heap', stats=None):
+    """ Runs dijkstras_shortest_path on a CompiledGraph.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        destination: The end location for the path.
+        graph: A CompiledGraph.
+        heuristic: An optional A* heuristic taking a cell coordinate.
+        queue: The priority queue to use, 'heap' or 'bucket'.
+        stats: An optional SearchStats to fill in.
+
+    Returns:
+        If a path exits, return a list containing all cells from initial_position to destination.
+        Otherwise, return None.
+    """
+    source = graph.index.get(initial_position)
+    target = graph.index.get(destination)
+    if source is None or target is None:
+        return None
+
+    cells = graph.cells
+    offsets = graph.offsets
+    neighbors = graph.neighbors
+    weights = graph.weights
+
+    n = len(cells)
+    cost_so_far = array('d', [inf]) * n
+    came_from = array('l', [-1]) * n
+    closed = bytearray(n)
+    expanded = 0
+
+    cost_so_far[source] = 0.
+    priorityQ, push, pop = make_queue(queue, lambda: min(weights, default=0))
+    if stats is not None:
+        push, pop = stats.wrap_queue(priorityQ, push, pop)
+        start = perf_counter()
+    push((0, source))
+
+    while priorityQ:
+        current_priority, u = pop()
+        if closed[u]:  # stale queue entry
+            continue
+        closed[u] = 1
+        expanded += 1
+        current_cost = cost_so_far[u]
+
+        if u == target:
+            if stats is not None:
+                # the target is settled but its edges are never scanned
+                closed[u] = 0
+                _finish(stats, start, graph, _closed_ids(closed), expanded)
+                start = perf_counter()
+            print("Total cost = ", current_cost, '\n')
+            print("Nodes expanded = ", expanded, '\n')
+            path = []
+            while u != -1:
+                path.append(cells[u])
+                u = came_from[u]
+            if stats is not None:
+                stats.add_time('path', start)
+            return path
+
+        for e in range(offsets[u], offsets[u + 1]):
+            v = neighbors[e]
+            pathCost = weights[e] + current_cost
+            if pathCost < cost_so_far[v]:
+                cost_so_far[v] = pathCost
+                came_from[v] = u
+                if heuristic is None:
+                    push((pathCost, v))
+                else:
+                    push((pathCost + heuristic(cells[v]), v))
+
+    if stats is not None:
+        _finish(stats, start, graph, _closed_ids(closed), expanded)
+    return None
+
+
+def compiled_shortest_path_to_all(initial_position, graph, parents=None, queue='heap', stats=None, max_cost=None,
+                                  max_cells=None):
+    """ Runs dijkstras_shortest_path_to_all on a CompiledGraph.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        graph: A CompiledGraph.
+        parents: An optional dictionary to fill with the back pointer of every reached cell.
+        queue: The priority queue to use, 'heap' or 'bucket'.
+        stats: An optional SearchStats to fill in.
+        max_cost: If given, only cells costing at most this much are expanded and returned.
+        max_cells: If given, stop once this many cells are settled.
+
+    Returns:
+        A dictionary, mapping destination cells to the cost of a path from the initial_position.
+    """
+    source = graph.index.get(initial_position)
+    if source is None:
+        if parents is not None:
+            parents[initial_position] = None
+        return {initial_position: 0}
+    if max_cost is not None or max_cells is not None:
+        return _bounded_shortest_path_to_all(source, graph, parents, queue, stats, max_cost, max_cells)
+
+    cells = graph.cells
+    offsets = graph.offsets
+    neighbors = graph.neighbors
+    weights = graph.weights
+
+    n = len(cells)
+    cost_so_far = array('d', [inf]) * n
+    came_from = array('l', [-1]) * n
+    closed = bytearray(n)
+
+    cost_so_far[source] = 0.
+    priorityQ, push, pop = make_queue(queue, lambda: min(weights, default=0))
+    if stats is not None:
+        push, pop = stats.wrap_queue(priorityQ, push, pop)
+        start = perf_counter()
+    push((0, source))
+
+    while priorityQ:
+        current_cost, u = pop()
+        if closed[u] or current_cost > cost_so_far[u]:  # stale queue entry
+            continue
+        closed[u] = 1
+
+        for e in range(offsets[u], offsets[u + 1]):
+            v = neighbors[e]
+            pathCost = weights[e] + current_cost
+            if pathCost < cost_so_far[v]:
+                cost_so_far[v] = pathCost
+                came_from[v] = u
+                push((pathCost, v))
+
+    if stats is not None:
+        _finish(stats, start, graph, _closed_ids(closed), closed.count(1))
+
+    if parents is not None:
+        parents.update((cell, cells[came_from[i]] if came_from[i] != -1 else None)
+                       for i, cell in enumerate(cells) if closed[i])
+
+    costs = {cell: cost_so_far[i] for i, cell in enumerate(cells) if closed[i]}
+    costs[initial_position] = 0
+    return costs
+
+
+def _bounded_shortest_path_to_all(source, graph, parents, queue, stats, max_cost, max_cells):
+    # compiled_shortest_path_to_all with its state in dictionaries, so a search confined to a small region does
+    # not pay for arrays over the whole graph
+    cells = graph.cells
+    offsets = graph.offsets
+    neighbors = graph.neighbors
+    weights = graph.weights
+
+    cost_so_far = {source: 0.}
+    came_from = {source: -1}
+    settled = {}
+    over_budget = 0
+
+    priorityQ, push, pop = make_queue(queue, lambda: min(weights, default=0))
+    if stats is not None:
+        push, pop = stats.wrap_queue(priorityQ, push, pop)
+        start = perf_counter()
+    push((0, source))
+
+    while priorityQ:
+        current_cost, u = pop()
+        if u in settled or current_cost > cost_so_far[u]:  # stale queue entry
+            continue
+        if max_cost is not None and current_cost > max_cost:
+            over_budget += 1
+            continue  # over budget; a bucket queue may still hold cheaper entries
+        if max_cells is not None and len(settled) >= max_cells:
+            over_budget += 1
+            break
+        settled[u] = current_cost
+
+        for e in range(offsets[u], offsets[u + 1]):
+            v = neighbors[e]
+            pathCost = weights[e] + current_cost
+            if pathCost < cost_so_far.get(v, inf):
+                cost_so_far[v] = pathCost
+                came_from[v] = u
+                push((pathCost, v))
+
+    if stats is not None:
+        _finish(stats, start, graph, settled, len(settled), over_budget)
+
+    if parents is not None:
+        parents.update((cells[u], cells[came_from[u]] if came_from[u] != -1 else None) for u in settled)
+
+    costs = {cells[u]: cost for u, cost in settled.items()}
+    if source in settled:
+        costs[cells[source]] = 0
+    return costs
+
+
+def _closed_ids(closed):
+    # ids of the cells marked in a closed bytearray
+    return (u for u in range(len(closed)) if closed[u])
+
+
+def _finish(stats, start, graph, expanded_ids, expanded, over_budget=0):
+    # records the search time and counters, counting the edges of every expanded cell at once
+    stats.add_time('search', start)
+    offsets = graph.offsets
+    stats.edges += sum(offsets[u + 1] - offsets[u] for u in expanded_ids)
+    stats.finish(expanded, over_budget)
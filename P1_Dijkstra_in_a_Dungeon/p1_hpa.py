@@ -0,0 +1,243 @@
+# Hierarchical pathfinding (HPA*) for P1
+
+from heapq import heappop, heappush
+from math import inf
+import pickle
+
+from p1 import dijkstras_shortest_path_to_all, navigation_edges, path_from_parents
+from p1_cache import level_fingerprint
+from p1_support import level_bounds
+
+# entrances at least this wide get a transition at each end instead of one in the middle
+WIDE_ENTRANCE = 6
+
+
+class Hierarchy:
+    """ An abstract graph over a level split into square clusters, following Botea et al.'s HPA*.
+
+    Abstract nodes are transition cells on cluster borders. They are joined by the single step crossing each
+    entrance and by the cheapest path between nodes of the same cluster that stays inside that cluster. Queries
+    search the abstract graph and only then search cell by cell inside the clusters the route passes through, so
+    paths are near-optimal rather than optimal.
+
+    Attributes:
+        level: The level the hierarchy was built from.
+        cluster_size: The width and height of a cluster, in cells.
+        bounds: The (x_lo, x_hi, y_lo, y_hi) bounding box of the level.
+        edges: A dictionary mapping each abstract node to a dictionary of its neighbors and edge costs.
+        fingerprint: The level_fingerprint of the level at build time.
+    """
+
+    def __init__(self, level, cluster_size, bounds, edges, fingerprint, adj=navigation_edges):
+        self.level = level
+        self.cluster_size = cluster_size
+        self.bounds = bounds
+        self.edges = edges
+        self.fingerprint = fingerprint
+        self.adj = adj
+
+        # abstract nodes grouped by cluster
+        self.nodes_by_cluster = {}
+        for node in edges:
+            self.nodes_by_cluster.setdefault(self.cluster(node), []).append(node)
+
+    def cluster(self, cell):
+        """ Returns the (column, row) of the cluster holding cell. """
+        return (cell[0] - self.bounds[0]) // self.cluster_size, (cell[1] - self.bounds[2]) // self.cluster_size
+
+    def cluster_edges(self, level, cell):
+        """ An adjacency function like adj, restricted to edges that stay inside cell's cluster. """
+        cluster = self.cluster(cell)
+        return [(new_node, cost) for new_node, cost in self.adj(level, cell) if self.cluster(new_node) == cluster]
+
+    def cluster_search(self, cell):
+        """ Runs dijkstras_shortest_path_to_all from cell without leaving its cluster.
+
+        Returns:
+            The costs and back pointers of every cell reached.
+        """
+        parents = {}
+        costs = dijkstras_shortest_path_to_all(cell, self.level, self.cluster_edges, parents)
+        return costs, parents
+
+    def shortest_path(self, initial_position, destination):
+        """ Searches for a path between two cells through the abstract graph.
+
+        Args:
+            initial_position: The initial cell from which the path extends.
+            destination: The end location for the path.
+
+        Returns:
+            If a path exits, return a list containing all cells from initial_position to destination, in the same
+            order dijkstras_shortest_path returns. Otherwise, return None.
+        """
+        src_costs, src_parents = self.cluster_search(initial_position)
+        dst_costs, dst_parents = self.cluster_search(destination)
+
+        # connect the endpoints to the abstract nodes of their clusters
+        src_nodes = self.nodes_by_cluster.get(self.cluster(initial_position), [])
+        dst_nodes = self.nodes_by_cluster.get(self.cluster(destination), [])
+        src_edges = {node: src_costs[node] for node in src_nodes if node in src_costs}
+        src_edges.update(self.edges.get(initial_position, {}))
+        dst_edges = {node: dst_costs[node] for node in dst_nodes if node in dst_costs}
+
+        # a route that stays inside one cluster is not in the abstract graph
+        best_cost = src_costs.get(destination, inf)
+        best_route = [initial_position, destination]
+
+        priorityQ = [(0, initial_position)]
+        came_from = {initial_position: None}
+        cost_so_far = {initial_position: 0}
+        while priorityQ:
+            current_cost, current_node = heappop(priorityQ)
+            if current_cost > cost_so_far[current_node]:  # stale queue entry
+                continue
+            if current_cost >= best_cost:
+                break
+            if current_node in dst_edges and current_cost + dst_edges[current_node] < best_cost:
+                best_cost = current_cost + dst_edges[current_node]
+                best_route = [destination, current_node]
+                curr = came_from[current_node]
+                while curr != None:
+                    best_route.append(curr)
+                    curr = came_from[curr]
+                best_route.reverse()
+
+            neighbors = src_edges if current_node == initial_position else self.edges.get(current_node, {})
+            for new_node, new_cost in neighbors.items():
+                pathCost = new_cost + current_cost
+                if new_node not in cost_so_far or pathCost < cost_so_far[new_node]:
+                    cost_so_far[new_node] = pathCost
+                    heappush(priorityQ, (pathCost, new_node))
+                    came_from[new_node] = current_node
+
+        if best_cost == inf:
+            return None
+        return self._refine(best_route, src_parents, dst_parents)
+
+    def _refine(self, route, src_parents, dst_parents):
+        # turns a route of abstract nodes into the full list of cells, destination first
+        forward = [route[0]]
+        for i in range(1, len(route)):
+            start, end = route[i - 1], route[i]
+            if self.cluster(start) != self.cluster(end):  # a single step across an entrance
+                segment = [start, end]
+            elif i == 1:
+                segment = path_from_parents(src_parents, end)[::-1]
+            elif i == len(route) - 1:
+                segment = path_from_parents(dst_parents, start)
+            else:
+                segment = path_from_parents(self.cluster_search(start)[1], end)[::-1]
+            forward.extend(segment[1:])
+        forward.reverse()
+        return forward
+
+
+def build_hierarchy(level, cluster_size=10, adj=navigation_edges):
+    """ Splits a level into clusters and precomputes the abstract graph between their entrances.
+
+    Args:
+        level: A loaded level, containing walls, spaces, and waypoints.
+        cluster_size: The width and height of a cluster, in cells.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+
+    Returns:
+        The Hierarchy for the level.
+    """
+    walls = level['walls']
+    spaces = level['spaces']
+    bounds = level_bounds(level)
+    x_lo, x_hi, y_lo, y_hi = bounds
+    columns = (x_hi - x_lo) // cluster_size + 1
+    rows = (y_hi - y_lo) // cluster_size + 1
+
+    def passable(cell):
+        return cell not in walls and cell in spaces
+
+    # pairs of cells joined by an edge that crosses a cluster border
+    crossings = []
+    for cx in range(columns):
+        for cy in range(rows):
+            x0, y0 = x_lo + cx * cluster_size, y_lo + cy * cluster_size
+            x1, y1 = min(x0 + cluster_size, x_hi + 1) - 1, min(y0 + cluster_size, y_hi + 1) - 1
+            if cx + 1 < columns:
+                crossings += _entrance_crossings([(x1, y) for y in range(y0, y1 + 1)],
+                                                 [(x1 + 1, y) for y in range(y0, y1 + 1)], passable)
+            if cy + 1 < rows:
+                crossings += _entrance_crossings([(x, y1) for x in range(x0, x1 + 1)],
+                                                 [(x, y1 + 1) for x in range(x0, x1 + 1)], passable)
+            if cx + 1 < columns and cy + 1 < rows:
+                for a, b in [((x1, y1), (x1 + 1, y1 + 1)), ((x1 + 1, y1), (x1, y1 + 1))]:
+                    if passable(a) and passable(b):
+                        crossings.append((a, b))
+
+    edges = {}
+    for a, b in crossings:
+        cost = dict(adj(level, a))[b]
+        edges.setdefault(a, {})[b] = cost
+        edges.setdefault(b, {})[a] = cost
+
+    hierarchy = Hierarchy(level, cluster_size, bounds, edges, level_fingerprint(level), adj)
+
+    # intra-cluster edges between the transitions of each cluster
+    for nodes in hierarchy.nodes_by_cluster.values():
+        for node in nodes:
+            costs, _ = hierarchy.cluster_search(node)
+            for other in nodes:
+                if other != node and other in costs:
+                    edges[node][other] = min(costs[other], edges[node].get(other, inf))
+
+    return hierarchy
+
+
+def _entrance_crossings(side_a, side_b, passable):
+    # picks the transition pairs along one border, given the facing cells on either side
+    crossings = []
+    open_pairs = [passable(a) and passable(b) for a, b in zip(side_a, side_b)]
+
+    i = 0
+    while i < len(open_pairs):
+        if not open_pairs[i]:
+            i += 1
+            continue
+        start = i
+        while i < len(open_pairs) and open_pairs[i]:
+            i += 1
+        end = i - 1
+        if end - start + 1 >= WIDE_ENTRANCE:
+            crossings += [(side_a[start], side_b[start]), (side_a[end], side_b[end])]
+        else:
+            middle = (start + end) // 2
+            crossings.append((side_a[middle], side_b[middle]))
+
+    # diagonal steps across the border that no straight entrance next to them covers
+    for i in range(len(open_pairs) - 1):
+        if open_pairs[i] or open_pairs[i + 1]:
+            continue
+        for a, b in [(side_a[i], side_b[i + 1]), (side_a[i + 1], side_b[i])]:
+            if passable(a) and passable(b):
+                crossings.append((a, b))
+
+    return crossings
+
+
+def save_hierarchy(hierarchy, filename):
+    """ Saves the abstract graph of a hierarchy so it can be reused with load_hierarchy. """
+    with open(filename, 'wb') as f:
+        pickle.dump({'cluster_size': hierarchy.cluster_size,
+                     'bounds': hierarchy.bounds,
+                     'edges': hierarchy.edges,
+                     'fingerprint': hierarchy.fingerprint}, f, pickle.HIGHEST_PROTOCOL)
+
+
+def load_hierarchy(filename, level, adj=navigation_edges):
+    """ Loads a hierarchy saved by save_hierarchy and attaches it to level.
+
+    Raises:
+        ValueError: If the level's walls or spaces differ from the ones the hierarchy was built from.
+    """
+    with open(filename, 'rb') as f:
+        data = pickle.load(f)
+    if data['fingerprint'] != level_fingerprint(level):
+        raise ValueError('Error: hierarchy was built for a different level.')
+    return Hierarchy(level, data['cluster_size'], data['bounds'], data['edges'], data['fingerprint'], adj)
@@ -0,0 +1,154 @@
+# Jump Point Search for P1
+
+from heapq import heappop, heappush
+
+from p1_support import HALF_DIAGONAL
+
+DIRECTIONS = [(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)]
+
+
+def jps_shortest_path(initial_position, destination, graph, adj):
+    """ Searches for a minimal cost path using Jump Point Search.
+
+    Inside regions where a cell and all of its passable neighbors share one cost, the search jumps along straight
+    and diagonal lines instead of queueing every cell, since the skipped cells only lie on paths of equal or
+    higher cost. Cells next to a cost boundary are always stopped at and expanded in every direction, so the path
+    cost stays optimal under the navigation_edges weights.
+
+    Args:
+        initial_position: The initial cell from which the path extends.
+        destination: The end location for the path.
+        graph: A loaded level, containing walls, spaces, and waypoints.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+            Jumps follow the navigation_edges cost model directly, so this is only accepted for signature
+            compatibility with dijkstras_shortest_path.
+
+    Returns:
+        If a path exits, return a list containing all cells from initial_position to destination.
+        Otherwise, return None.
+
+    """
+    walls = graph['walls']
+    spaces = graph['spaces']
+    uniform_cache = {}
+
+    def passable(cell):
+        return cell not in walls and cell in spaces
+
+    def uniform(cell):
+        # True if every passable neighbor costs the same as cell
+        if cell not in uniform_cache:
+            x, y = cell
+            cost = spaces[cell]
+            uniform_cache[cell] = all(spaces[(x + dx, y + dy)] == cost for dx, dy in DIRECTIONS
+                                      if passable((x + dx, y + dy)))
+        return uniform_cache[cell]
+
+    def forced(cell, dx, dy):
+        # True if a neighbor of cell can only be reached optimally through cell
+        x, y = cell
+        if dx and dy:
+            return ((not passable((x - dx, y)) and passable((x - dx, y + dy))) or
+                    (not passable((x, y - dy)) and passable((x + dx, y - dy))))
+        if dx:
+            return ((not passable((x, y + 1)) and passable((x + dx, y + 1))) or
+                    (not passable((x, y - 1)) and passable((x + dx, y - 1))))
+        return ((not passable((x + 1, y)) and passable((x + 1, y + dy))) or
+                (not passable((x - 1, y)) and passable((x - 1, y + dy))))
+
+    def jump(cell, dx, dy, cost):
+        # walks from cell in direction (dx, dy), returning the next jump point and its cost, or None
+        diagonal = dx and dy
+        while True:
+            new_cell = (cell[0] + dx, cell[1] + dy)
+            if not passable(new_cell):
+                return None
+            if diagonal:
+                cost = cost + ((HALF_DIAGONAL * spaces[new_cell]) + (HALF_DIAGONAL * spaces[cell]))
+            else:
+                cost = cost + ((0.5 * spaces[new_cell]) + (0.5 * spaces[cell]))
+            if new_cell == destination or not uniform(new_cell) or forced(new_cell, dx, dy):
+                return new_cell, cost
+            if diagonal and (jump(new_cell, dx, 0, cost) or jump(new_cell, 0, dy, cost)):
+                return new_cell, cost
+            cell = new_cell
+
+    def directions(cell, parent):
+        # the directions left after pruning, or all of them at the start and at cost boundaries
+        if parent is None or not uniform(cell):
+            return DIRECTIONS
+        x, y = cell
+        dx = (x > parent[0]) - (x < parent[0])
+        dy = (y > parent[1]) - (y < parent[1])
+        if dx and dy:
+            result = [(dx, 0), (0, dy), (dx, dy)]
+            if not passable((x - dx, y)):
+                result.append((-dx, dy))
+            if not passable((x, y - dy)):
+                result.append((dx, -dy))
+        elif dx:
+            result = [(dx, 0)]
+            if not passable((x, y + 1)):
+                result.append((dx, 1))
+            if not passable((x, y - 1)):
+                result.append((dx, -1))
+        else:
+            result = [(0, dy)]
+            if not passable((x + 1, y)):
+                result.append((1, dy))
+            if not passable((x - 1, y)):
+                result.append((-1, dy))
+        return result
+
+    if not passable(initial_position):
+        return None
+
+    # assembling queue on heap
+    priorityQ = []
+    heappush(priorityQ, (0, initial_position))
+
+    # back pointer, jump points only
+    came_from = {initial_position: None}
+
+    # keeps track of cost
+    cost_so_far = {initial_position: 0}
+
+    # cells that have already been expanded
+    closed = set()
+
+    while priorityQ:
+        current_cost, current_node = heappop(priorityQ)
+
+        if current_node in closed:  # stale queue entry
+            continue
+        closed.add(current_node)
+
+        if current_node == destination:
+            print("Total cost = ", cost_so_far[current_node], '\n')
+            print("Nodes expanded = ", len(closed), '\n')
+            return _expand_jumps(current_node, came_from)
+
+        for dx, dy in directions(current_node, came_from[current_node]):
+            jump_point = jump(current_node, dx, dy, current_cost)
+            if jump_point is None:
+                continue
+            new_node, pathCost = jump_point
+            if new_node not in cost_so_far or pathCost < cost_so_far[new_node]:
+                cost_so_far[new_node] = pathCost
+                heappush(priorityQ, (pathCost, new_node))
+                came_from[new_node] = current_node
+    return None
+
+
+def _expand_jumps(destination, came_from):
+    # fills in the cells skipped between consecutive jump points
+    path = [destination]
+    curr = destination
+    while came_from[curr] != None:
+        parent = came_from[curr]
+        dx = (parent[0] > curr[0]) - (parent[0] < curr[0])
+        dy = (parent[1] > curr[1]) - (parent[1] < curr[1])
+        while curr != parent:
+            curr = (curr[0] + dx, curr[1] + dy)
+            path.append(curr)
+    return path
@@ -0,0 +1,69 @@
+# Priority queues for the P1 searches
+
+from functools import partial
+from heapq import heappop, heappush
+
+QUEUES = ('heap', 'bucket')
+
+
+class BucketQueue:
+    """ A monotone bucket queue for Dijkstra's algorithm (Dial's algorithm).
+
+    Items are (priority, cell) tuples. Bucket k holds priorities in [k * width, (k + 1) * width). As long as width
+    is below the cheapest edge cost, no cell can lower the cost of another cell in its own bucket, so a bucket can
+    be emptied in any order and pushes and pops take constant time instead of O(log n). Priorities pushed must
+    never be lower than the last one popped.
+    """
+
+    def __init__(self, width):
+        # shave off a little so rounding cannot put a relaxed cell back in the bucket it came from
+        self.width = width * (1 - 1e-9)
+        self.buckets = {}
+        self.current = 0
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def push(self, item):
+        bucket = int(item[0] / self.width)
+        if bucket < self.current:
+            bucket = self.current
+        try:
+            self.buckets[bucket].append(item)
+        except KeyError:
+            self.buckets[bucket] = [item]
+        self.size += 1
+
+    def pop(self):
+        if not self.size:
+            raise IndexError('pop from an empty bucket queue')
+        self.size -= 1
+        bucket = self.buckets.get(self.current)
+        while not bucket:
+            self.buckets.pop(self.current, None)
+            self.current += 1
+            bucket = self.buckets.get(self.current)
+        return bucket.pop()
+
+
+def make_queue(queue, min_edge_cost):
+    """ Creates an empty priority queue for a search.
+
+    Args:
+        queue: 'heap' for a binary heap, or 'bucket' for a BucketQueue.
+        min_edge_cost: A function returning a lower bound on the graph's edge costs, only called for a bucket
+            queue. A bucket queue needs it to be positive and falls back to a heap otherwise.
+
+    Returns:
+        The queue and its push and pop functions.
+    """
+    if queue not in QUEUES:
+        raise ValueError('Error: unknown queue ' + repr(queue) + ', expected one of ' + repr(QUEUES) + '.')
+    if queue == 'bucket':
+        width = min_edge_cost()
+        if width > 0:
+            bucket_queue = BucketQueue(width)
+            return bucket_queue, bucket_queue.push, bucket_queue.pop
+    heap = []
+    return heap, partial(heappush, heap), partial(heappop, heap)
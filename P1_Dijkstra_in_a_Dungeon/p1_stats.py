@@ -0,0 +1,92 @@
+# Search instrumentation for P1
+
+from time import perf_counter
+
+
+class SearchStats:
+    """ Counters and timings filled in by a search that is handed one.
+
+    Searches count through wrapped queue and adjacency functions, which they only build when given a SearchStats.
+    Without one, they run exactly as before. Handing the same SearchStats to several searches adds up their
+    counters, except max_queue, which keeps the largest.
+
+    Attributes:
+        searches: Searches that have run with this SearchStats.
+        pushes: Entries pushed onto the priority queue.
+        popped: Entries popped from the priority queue.
+        stale: Popped entries skipped because their cell had already been settled at a lower cost.
+        over_budget: Popped entries left unsettled because they were past a max_cost or max_cells bound.
+        expanded: Cells settled, i.e. popped entries that were not stale.
+        max_queue: The largest the priority queue grew.
+        edges: Edges looked at while expanding cells.
+        relaxed: Edges that lowered the cost of the cell they lead to.
+        phases: A dictionary mapping phase names to the wall-clock seconds spent in them.
+    """
+
+    def __init__(self):
+        self.searches = 0
+        self.pushes = 0
+        self.popped = 0
+        self.stale = 0
+        self.over_budget = 0
+        self.expanded = 0
+        self.max_queue = 0
+        self.edges = 0
+        self.relaxed = 0
+        self.phases = {}
+
+    def add_time(self, phase, start):
+        """ Adds the time since start (a perf_counter reading) to a phase. """
+        self.phases[phase] = self.phases.get(phase, 0) + perf_counter() - start
+
+    def wrap_queue(self, queue, push, pop):
+        """ Returns push and pop functions for queue that also count pushes, pops and the queue size.
+
+        Each search wraps its queue once, so this also counts the search.
+        """
+        self.searches += 1
+
+        def counting_push(item):
+            push(item)
+            self.pushes += 1
+            if len(queue) > self.max_queue:
+                self.max_queue = len(queue)
+
+        def counting_pop():
+            self.popped += 1
+            return pop()
+
+        return counting_push, counting_pop
+
+    def wrap_adj(self, adj):
+        """ Returns an adjacency function that also counts the edges it returns. """
+        def counting_adj(graph, cell):
+            edges = adj(graph, cell)
+            self.edges += len(edges)
+            return edges
+
+        return counting_adj
+
+    def finish(self, expanded, over_budget=0):
+        """ Records how many cells were settled and how many pops a bound left unsettled, from which stale pops
+        and relaxations follow. """
+        self.expanded += expanded
+        self.over_budget += over_budget
+        self.stale = self.popped - self.expanded - self.over_budget
+        # every successful relaxation pushes exactly once, besides the initial push of each search's source
+        self.relaxed = self.pushes - self.searches
+
+    def report(self):
+        """ Prints the counters and phase timings. """
+        print("Nodes popped = ", self.popped)
+        print("Stale pops = ", self.stale)
+        if self.over_budget:
+            print("Over-budget pops = ", self.over_budget)
+        print("Nodes expanded = ", self.expanded)
+        print("Pushes = ", self.pushes)
+        print("Max queue size = ", self.max_queue)
+        print("Edges scanned = ", self.edges)
+        print("Edges relaxed = ", self.relaxed)
+        for phase, seconds in self.phases.items():
+            print("Time in %s = %.6f s" % (phase, seconds))
+        print()
@@ -1,10 +1,55 @@
 # Support code for P1
 
-from math import inf
+from math import inf, sqrt
 from csv import writer
+from array import array
+from hashlib import sha256
+from mmap import mmap, ACCESS_READ
+from struct import Struct, pack
+from os.path import splitext
+from sys import byteorder
+import sys
+from re import compile as compile_pattern
+from collections.abc import Mapping, MutableMapping, MutableSet
 
 WALL = 'X'
 
+# cell cost per level character, walls and blanks are left out
+CELL_COSTS = {str(d): float(d) for d in range(10)}
+CELL_COSTS.update({chr(c): 1. for c in range(ord('a'), ord('z') + 1)})
+
+# maps each level character to 1 if it is a wall and 0 otherwise
+WALL_TABLE = bytes(int(c == ord(WALL)) for c in range(256))
+
+WAYPOINT_PATTERN = compile_pattern('[a-z]')
+
+# each end of a diagonal edge weighs its cell's cost by this, as navigation_edges does
+HALF_DIAGONAL = 0.5 * sqrt(2)
+
+# binary level layout: header, waypoint table, uint8 cost grid, wall bitset
+BINARY_MAGIC = b'P1LV'
+BINARY_VERSION = 1
+BINARY_HEADER = Struct('<4sHHIIII')  # magic, version, waypoint count, width, height, space count, wall count
+BINARY_WAYPOINT = Struct('<cII')  # character, x, y
+
+# uint8 cost stored for cells that are not spaces
+NO_SPACE = 255
+BINARY_COSTS = [float(cost) for cost in range(NO_SPACE)] + [inf]
+
+# file types save_level_costs can write
+COST_FORMATS = ('.csv', '.npy', '.f32')
+NPY_MAGIC = b'\x93NUMPY\x01\x00'
+
+# raw float32 cost files start with: magic, width, height, x and y of the first value
+COST_MAGIC = b'P1CF'
+COST_HEADER = Struct('<4sIIii')
+
+# character shown for each cell cost
+COST_CHARS = {float(d): str(d) for d in range(10)}
+
+# maps each binary cost byte to the character shown for it, blanks for cells that are not spaces
+BINARY_CHARS = bytes((ord(str(c)) if c < 10 else ord(' ')) for c in range(256))
+
 
 def load_level(filename):
     """ Loads a level from a given text file.
@@ -41,6 +86,371 @@ def load_level(filename):
     return level
 
 
+class GridLevel(Mapping):
+    """ An array-backed level.
+
+    Cell (x, y) lives at index y * width + x of a float32 cost grid and a boolean wall mask; cells that are not
+    spaces cost inf. Indexing the level with 'walls', 'spaces' or 'waypoints' gives set/dict-like views over the
+    arrays, so it can be passed anywhere a level from load_level is expected. Editing those views bumps version.
+
+    Attributes:
+        width: The number of columns in the grid.
+        height: The number of rows in the grid.
+        costs: The float32 cost grid (array('f')).
+        wall_mask: The wall mask (bytearray, 1 for walls).
+        waypoints: A mapping of waypoint characters to locations.
+        version: A counter incremented whenever walls or spaces change.
+    """
+
+    def __init__(self, width, height, costs, wall_mask, waypoints):
+        self.width = width
+        self.height = height
+        self.costs = costs
+        self.wall_mask = wall_mask
+        self.waypoints = waypoints
+        self.version = 0
+        self._fingerprint = None
+        self._views = {'walls': _WallsView(self),
+                       'spaces': _SpacesView(self),
+                       'waypoints': waypoints}
+
+    def __getitem__(self, key):
+        return self._views[key]
+
+    def __iter__(self):
+        return iter(self._views)
+
+    def __len__(self):
+        return len(self._views)
+
+    def index(self, cell):
+        """ Returns the flat array index of a cell, or None if it lies outside the grid. """
+        x, y = cell
+        if 0 <= x < self.width and 0 <= y < self.height:
+            return y * self.width + x
+        return None
+
+    def fingerprint(self):
+        """ Returns a digest of the walls and spaces, recomputed only after the level changes. """
+        if self._fingerprint is None or self._fingerprint[0] != self.version:
+            digest = sha256(b'%d,%d;' % (self.width, self.height))
+            digest.update(self.costs)
+            digest.update(self.wall_mask)
+            self._fingerprint = (self.version, digest.hexdigest())
+        return self._fingerprint[1]
+
+    def cell_costs(self):
+        """ Returns a list of every cell's cost in flat index order, inf for walls and cells that are not spaces. """
+        costs = list(map(self._cost, range(self.width * self.height)))
+        for i in self._wall_indices():
+            costs[i] = inf
+        return costs
+
+    def bounds(self):
+        """ Returns (x_lo, x_hi, y_lo, y_hi), the bounding box of all walls and spaces. """
+        width = self.width
+        x_lo, x_hi, ys = width, -1, []
+        for j in range(self.height):
+            start = j * width
+            if self._row_empty(start, start + width):
+                continue
+            ys.append(j)
+            lo = 0
+            while not self._is_wall(start + lo) and self._cost(start + lo) == inf:
+                lo += 1
+            hi = width - 1
+            while not self._is_wall(start + hi) and self._cost(start + hi) == inf:
+                hi -= 1
+            x_lo, x_hi = min(x_lo, lo), max(x_hi, hi)
+        return x_lo, x_hi, ys[0], ys[-1]
+
+    # storage access used by the views, overridden by other backends
+
+    def _cost(self, i):
+        return self.costs[i]
+
+    def _is_wall(self, i):
+        return self.wall_mask[i] == 1
+
+    def _row_empty(self, start, end):
+        return self.costs[start:end].count(inf) == end - start and self.wall_mask.find(1, start, end) == -1
+
+    def _row_chars(self, start, end):
+        # characters of cells start to end as show_level draws them, before waypoints and paths
+        row = [' ' if cost == inf else COST_CHARS.get(cost) or str(int(cost)) for cost in self.costs[start:end]]
+        mask = self.wall_mask
+        i = mask.find(1, start, end)
+        while i != -1:
+            row[i - start] = WALL
+            i = mask.find(1, i + 1, end)
+        return row
+
+    def _wall_indices(self):
+        mask = self.wall_mask
+        i = mask.find(1)
+        while i != -1:
+            yield i
+            i = mask.find(1, i + 1)
+
+    def _space_indices(self):
+        return (i for i, cost in enumerate(self.costs) if cost != inf)
+
+    def _wall_count(self):
+        return self.wall_mask.count(1)
+
+    def _space_count(self):
+        return len(self.costs) - self.costs.count(inf)
+
+    def _set_cost(self, i, cost):
+        self.costs[i] = cost
+        self.version += 1
+
+    def _set_wall(self, i, wall):
+        self.wall_mask[i] = wall
+        self.version += 1
+
+
+class _WallsView(MutableSet):
+    """ A set-like view of the walls of a GridLevel. """
+
+    def __init__(self, level):
+        self._level = level
+
+    def __contains__(self, cell):
+        i = self._level.index(cell)
+        return i is not None and self._level._is_wall(i)
+
+    def __iter__(self):
+        width = self._level.width
+        for i in self._level._wall_indices():
+            yield i % width, i // width
+
+    def __len__(self):
+        return self._level._wall_count()
+
+    def add(self, cell):
+        i = self._level.index(cell)
+        if i is None:
+            raise KeyError(cell)
+        self._level._set_wall(i, 1)
+
+    def discard(self, cell):
+        i = self._level.index(cell)
+        if i is not None and self._level._is_wall(i):
+            self._level._set_wall(i, 0)
+
+
+class _SpacesView(MutableMapping):
+    """ A dict-like view of the spaces of a GridLevel, mapping cells to their costs. """
+
+    def __init__(self, level):
+        self._level = level
+
+    def __getitem__(self, cell):
+        i = self._level.index(cell)
+        if i is None or self._level._cost(i) == inf:
+            raise KeyError(cell)
+        return self._level._cost(i)
+
+    def __contains__(self, cell):
+        i = self._level.index(cell)
+        return i is not None and self._level._cost(i) != inf
+
+    def __iter__(self):
+        width = self._level.width
+        for i in self._level._space_indices():
+            yield i % width, i // width
+
+    def __len__(self):
+        return self._level._space_count()
+
+    def values(self):
+        return (self._level._cost(i) for i in self._level._space_indices())
+
+    def __setitem__(self, cell, cost):
+        i = self._level.index(cell)
+        if i is None:
+            raise KeyError(cell)
+        self._level._set_cost(i, cost)
+
+    def __delitem__(self, cell):
+        if cell not in self:
+            raise KeyError(cell)
+        self._level._set_cost(self._level.index(cell), inf)
+
+
+def load_level_grid(filename):
+    """ Loads a level from a given text file into a GridLevel.
+
+    Args:
+        filename: The name of the txt file containing the maze.
+
+    Returns:
+        The loaded GridLevel.
+
+    """
+    with open(filename, "r") as f:
+        lines = [line.rstrip('\n') for line in f]
+
+    width = max((len(line) for line in lines), default=0)
+    height = len(lines)
+
+    costs = array('f')
+    wall_mask = bytearray()
+    waypoints = {}
+    for j, line in enumerate(lines):
+        line = line.ljust(width)
+        costs.extend([CELL_COSTS.get(char, inf) for char in line])
+        wall_mask += line.encode('latin-1', 'replace').translate(WALL_TABLE)
+        for match in WAYPOINT_PATTERN.finditer(line):
+            waypoints[match.group()] = (match.start(), j)
+
+    return GridLevel(width, height, costs, wall_mask, waypoints)
+
+
+class MappedLevel(GridLevel):
+    """ A read-only GridLevel backed by a memory-mapped binary level file.
+
+    Nothing is parsed up front: costs and walls are read straight from the mapped uint8 cost grid and wall bitset
+    as cells are visited. Use convert_level to produce the file and load_level_binary to open it.
+    """
+
+    def __init__(self, filename):
+        with open(filename, 'rb') as f:
+            self._mmap = mmap(f.fileno(), 0, access=ACCESS_READ)
+        data = memoryview(self._mmap)
+
+        magic, version, waypoint_count, width, height, space_count, wall_count = BINARY_HEADER.unpack_from(data)
+        if magic != BINARY_MAGIC or version != BINARY_VERSION:
+            raise ValueError('Error: ' + filename + ' is not a binary level file.')
+
+        waypoints = {}
+        offset = BINARY_HEADER.size
+        for _ in range(waypoint_count):
+            char, x, y = BINARY_WAYPOINT.unpack_from(data, offset)
+            waypoints[char.decode('ascii')] = (x, y)
+            offset += BINARY_WAYPOINT.size
+
+        n = width * height
+        costs = data[offset:offset + n]
+        wall_bits = data[offset + n:offset + n + (n + 7) // 8]
+        super().__init__(width, height, costs, wall_bits, waypoints)
+        self._counts = (space_count, wall_count)
+
+    def close(self):
+        """ Unmaps the level file. """
+        self.costs.release()
+        self.wall_mask.release()
+        self._mmap.close()
+
+    def fingerprint(self):
+        """ Returns a digest of the walls and spaces. """
+        if self._fingerprint is None:
+            digest = sha256(b'%d,%d;' % (self.width, self.height))
+            digest.update(self.costs)
+            digest.update(self.wall_mask)
+            self._fingerprint = (self.version, digest.hexdigest())
+        return self._fingerprint[1]
+
+    def _cost(self, i):
+        return BINARY_COSTS[self.costs[i]]
+
+    def _is_wall(self, i):
+        return (self.wall_mask[i >> 3] >> (i & 7)) & 1 == 1
+
+    def _row_empty(self, start, end):
+        return (self.costs[start:end].tobytes().count(NO_SPACE) == end - start and
+                not any(self._is_wall(i) for i in range(start, end)))
+
+    def _row_chars(self, start, end):
+        row = list(self.costs[start:end].tobytes().translate(BINARY_CHARS).decode('ascii'))
+        bits = self.wall_mask
+        for byte_index in range(start >> 3, ((end - 1) >> 3) + 1):
+            byte = bits[byte_index]
+            if byte:
+                for i in range(max(byte_index << 3, start), min((byte_index << 3) + 8, end)):
+                    if byte >> (i & 7) & 1:
+                        row[i - start] = WALL
+        return row
+
+    def _wall_indices(self):
+        n = self.width * self.height
+        for byte_index, byte in enumerate(self.wall_mask):
+            if byte:
+                for bit in range(8):
+                    if byte >> bit & 1 and byte_index * 8 + bit < n:
+                        yield byte_index * 8 + bit
+
+    def _space_indices(self):
+        return (i for i, cost in enumerate(self.costs) if cost != NO_SPACE)
+
+    def _wall_count(self):
+        return self._counts[1]
+
+    def _space_count(self):
+        return self._counts[0]
+
+    def _set_cost(self, i, cost):
+        raise TypeError('Error: memory-mapped levels are read-only.')
+
+    def _set_wall(self, i, wall):
+        raise TypeError('Error: memory-mapped levels are read-only.')
+
+
+def convert_level(filename, binary_filename):
+    """ Converts a text level file into the compact binary format read by load_level_binary.
+
+    Args:
+        filename: The name of the txt file containing the maze.
+        binary_filename: The name of the binary file to be created.
+
+    """
+    level = load_level_grid(filename)
+    n = level.width * level.height
+
+    costs = bytearray(n)
+    for i, cost in enumerate(level.costs):
+        if cost == inf:
+            costs[i] = NO_SPACE
+        elif cost == int(cost) and 0 <= cost < NO_SPACE:
+            costs[i] = int(cost)
+        else:
+            raise ValueError('Error: cell cost ' + str(cost) + ' does not fit the binary format.')
+
+    wall_bits = bytearray((n + 7) // 8)
+    for i in level._wall_indices():
+        wall_bits[i >> 3] |= 1 << (i & 7)
+
+    with open(binary_filename, 'wb') as f:
+        f.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, len(level.waypoints), level.width, level.height,
+                                   level._space_count(), level._wall_count()))
+        for char, (x, y) in level.waypoints.items():
+            f.write(BINARY_WAYPOINT.pack(char.encode('ascii'), x, y))
+        f.write(costs)
+        f.write(wall_bits)
+
+
+def load_level_binary(filename):
+    """ Loads a level written by convert_level by memory-mapping it.
+
+    Args:
+        filename: The name of the binary level file.
+
+    Returns:
+        The loaded MappedLevel.
+
+    """
+    return MappedLevel(filename)
+
+
+def level_bounds(level):
+    """ Returns (x_lo, x_hi, y_lo, y_hi), the bounding box of all walls and spaces in a level. """
+    if isinstance(level, GridLevel):
+        return level.bounds()
+    xs, ys = zip(*(list(level['spaces'].keys()) + list(level['walls'])))
+    return min(xs), max(xs), min(ys), max(ys)
+
+
 def show_level(level, path=[]):
     """ Displays a level via a print statement.
 
@@ -49,65 +459,129 @@ def show_level(level, path=[]):
         path: A continuous path to be displayed over the level, if provided.
 
     """
-    xs, ys = zip(*(list(level['spaces'].keys()) + list(level['walls'])))
-    x_lo, x_hi = min(xs), max(xs)
-    y_lo, y_hi = min(ys), max(ys)
+    render_level(level, path)
+
 
-    path_cells = set(path)
+def render_level(level, path=[], viewport=None, margin=None, out=None):
+    """ Writes a level as text one row at a time, as show_level displays it.
 
-    chars = []
-    inverted_waypoints = {point: char for char, point in level['waypoints'].items()}
+    Only one row is held at a time, and the path is marked in a mask covering just the rows and columns drawn.
+    Rows of a GridLevel are built straight from its arrays rather than cell by cell.
+
+    Args:
+        level: The level to be displayed.
+        path: A continuous path to be displayed over the level, if provided.
+        viewport: An optional (x_lo, x_hi, y_lo, y_hi) window to draw instead of the whole level.
+        margin: If given with a path, draw only the path's bounding box grown by this many cells on every side.
+        out: The file to write to, sys.stdout by default.
+
+    """
+    if out is None:
+        out = sys.stdout
+    x_lo, x_hi, y_lo, y_hi = level_bounds(level)
+    if margin is not None and path:
+        xs = [cell[0] for cell in path]
+        ys = [cell[1] for cell in path]
+        viewport = min(xs) - margin, max(xs) + margin, min(ys) - margin, max(ys) + margin
+    if viewport is not None:
+        x_lo, x_hi = max(x_lo, viewport[0]), min(x_hi, viewport[1])
+        y_lo, y_hi = max(y_lo, viewport[2]), min(y_hi, viewport[3])
+    if x_lo > x_hi or y_lo > y_hi:  # the window misses the level
+        out.write('\n')
+        return
+    width = x_hi - x_lo + 1
+
+    # path cells inside the window, and waypoints by row
+    path_mask = bytearray(width * (y_hi - y_lo + 1))
+    for i, j in path:
+        if x_lo <= i <= x_hi and y_lo <= j <= y_hi:
+            path_mask[(j - y_lo) * width + i - x_lo] = 1
+    waypoint_rows = {}
+    for char, (i, j) in level['waypoints'].items():
+        if x_lo <= i <= x_hi and y_lo <= j <= y_hi:
+            waypoint_rows.setdefault(j, []).append((i, char))
+
+    grid = isinstance(level, GridLevel)
+    walls = level['walls']
+    spaces = level['spaces']
 
     for j in range(y_lo, y_hi + 1):
-        for i in range(x_lo, x_hi + 1):
-
-            cell = (i, j)
-            if cell in path_cells:
-                chars.append('*')
-            elif cell in level['walls']:
-                chars.append('X')
-            elif cell in inverted_waypoints:
-                chars.append(inverted_waypoints[cell])
-            elif cell in level['spaces']:
-                chars.append(str(int(level['spaces'][cell])))
-            else:
-                chars.append(' ')
+        if grid:
+            start = j * level.width
+            row = level._row_chars(start + x_lo, start + x_hi + 1)
+        else:
+            row = [WALL if (i, j) in walls else str(int(spaces[(i, j)])) if (i, j) in spaces else ' '
+                   for i in range(x_lo, x_hi + 1)]
+
+        for i, char in waypoint_rows.get(j, ()):
+            if row[i - x_lo] != WALL:
+                row[i - x_lo] = char
 
-        chars.append('\n')
+        offset = (j - y_lo) * width
+        k = path_mask.find(1, offset, offset + width)
+        while k != -1:
+            row[k - offset] = '*'
+            k = path_mask.find(1, k + 1, offset + width)
 
-    print(''.join(chars))
+        out.write(''.join(row))
+        out.write('\n')
+    out.write('\n')
 
 
 def save_level_costs(level, costs, filename='distance_map.csv'):
     """ Displays cell costs from an origin point over the given level.
 
+    Rows are produced and written one at a time, so the whole matrix is never held in memory. The file type
+    follows the extension: '.csv' for text, '.npy' for a float32 NumPy array file, or '.f32' for raw little-endian
+    float32 values after a small header (see COST_HEADER).
+
     Args:
         level: The level to be displayed.
-        costs: A dictionary containing a mapping of cells to costs from an origin point.
-        filename: The name of the csv file to be created.
+        costs: A dictionary containing a mapping of cells to costs from an origin point, or for a GridLevel, an
+            array of costs in flat index order such as the one p1_field.distance_field returns.
+        filename: The name of the file to be created.
 
     """
-    xs, ys = zip(*(list(level['spaces'].keys()) + list(level['walls'])))
-    x_lo, x_hi = min(xs), max(xs)
-    y_lo, y_hi = min(ys), max(ys)
+    x_lo, x_hi, y_lo, y_hi = level_bounds(level)
+    width, height = x_hi - x_lo + 1, y_hi - y_lo + 1
 
-    rows = []
-    for j in range(y_lo, y_hi + 1):
-        row = []
+    extension = splitext(filename)[1]
+    assert extension in COST_FORMATS, 'Error: filename does not contain file type.'
+
+    rows = _cost_rows(level, costs, x_lo, x_hi, y_lo, y_hi)
 
-        for i in range(x_lo, x_hi + 1):
-            cell = (i, j)
-            if cell not in costs:
-                row.append(inf)
+    if extension == '.csv':
+        with open(filename, 'w', newline='') as f:
+            csv_writer = writer(f)
+            for row in rows:
+                csv_writer.writerow(row)
+    else:
+        with open(filename, 'wb') as f:
+            if extension == '.npy':
+                f.write(_npy_header('<f4', (height, width)))
             else:
-                row.append(costs[cell])
+                f.write(COST_HEADER.pack(COST_MAGIC, width, height, x_lo, y_lo))
+            for row in rows:
+                values = array('f', row)
+                if byteorder == 'big':
+                    values.byteswap()
+                f.write(values)
 
-        rows.append(row)
+    print("Saved file:", filename)
+
+
+def _cost_rows(level, costs, x_lo, x_hi, y_lo, y_hi):
+    # yields one list of costs per row of the bounding box
+    for j in range(y_lo, y_hi + 1):
+        if isinstance(costs, array):
+            start = j * level.width
+            yield costs[start + x_lo:start + x_hi + 1].tolist()
+        else:
+            yield [costs.get((i, j), inf) for i in range(x_lo, x_hi + 1)]
 
-    assert '.csv' in filename, 'Error: filename does not contain file type.'
-    with open(filename, 'w', newline='') as f:
-        csv_writer = writer(f)
-        for row in rows:
-            csv_writer.writerow(row)
 
-    print("Saved file:", filename)
\ No newline at end of file
+def _npy_header(descr, shape):
+    # the version 1.0 .npy preamble, padded so the data starts on a 64 byte boundary
+    header = "{'descr': '%s', 'fortran_order': False, 'shape': %r, }" % (descr, shape)
+    header += ' ' * (63 - (len(NPY_MAGIC) + 2 + len(header)) % 64) + '\n'
+    return NPY_MAGIC + pack('<H', len(header)) + header.encode('latin-1')
@@ -0,0 +1,242 @@
+# Out-of-core tiled levels for P1
+
+from collections import OrderedDict
+from hashlib import sha256
+from math import inf
+from struct import Struct
+
+from p1_support import BINARY_WAYPOINT, CELL_COSTS, NO_SPACE, WALL, WAYPOINT_PATTERN, GridLevel
+
+# tiled level layout: header, waypoint table, then one tile_size * tile_size block of cell codes per tile, tiles in
+# row-major order and cells row-major within a tile
+TILE_MAGIC = b'P1TL'
+TILE_HEADER = Struct('<4sHIIIII4i')  # magic, tile size, width, height, waypoint count, space count, wall count,
+# x_lo, x_hi, y_lo, y_hi
+
+# cell codes: the cost of a space, or one of these
+WALL_CODE = 254
+TILE_COSTS = [float(cost) for cost in range(WALL_CODE)] + [inf, inf]
+
+# maps each cell code to the character show_level draws for it, before waypoints and paths
+TILE_CHARS = bytes(ord(str(code)) if code < 10 else ord(WALL) if code == WALL_CODE else ord(' ')
+                   for code in range(256))
+
+# maps each level character to its cell code
+CODE_TABLE = bytearray([NO_SPACE]) * 256
+for _char, _cost in CELL_COSTS.items():
+    CODE_TABLE[ord(_char)] = int(_cost)
+CODE_TABLE[ord(WALL)] = WALL_CODE
+CODE_TABLE = bytes(CODE_TABLE)
+
+
+def convert_level_tiles(filename, tiled_filename, tile_size=64):
+    """ Converts a text level file into the tiled format read by TiledLevel, without loading the whole level.
+
+    The text is read twice, once for the level's size, waypoints and counts and once a band of tile_size rows at
+    a time to write the tiles, so memory use is bounded by one band.
+
+    Args:
+        filename: The name of the txt file containing the maze.
+        tiled_filename: The name of the tiled file to be created.
+        tile_size: The width and height of a tile, in cells.
+
+    """
+    width = height = space_count = wall_count = 0
+    x_lo, x_hi, y_lo, y_hi = inf, -1, inf, -1
+    waypoints = {}
+    with open(filename, "r") as f:
+        for j, line in enumerate(f):
+            line = line.rstrip('\n')
+            width = max(width, len(line))
+            height = j + 1
+            codes = line.encode('latin-1', 'replace').translate(CODE_TABLE)
+            walls = codes.count(WALL_CODE)
+            spaces = len(codes) - walls - codes.count(NO_SPACE)
+            wall_count += walls
+            space_count += spaces
+            if walls or spaces:
+                used = [i for i, code in enumerate(codes) if code != NO_SPACE]
+                x_lo, x_hi = min(x_lo, used[0]), max(x_hi, used[-1])
+                y_lo, y_hi = min(y_lo, j), j
+            for match in WAYPOINT_PATTERN.finditer(line):
+                waypoints[match.group()] = (match.start(), j)
+    if x_hi == -1:
+        x_lo = x_hi = y_lo = y_hi = 0
+
+    tiles_x = -(-width // tile_size)
+    row_width = tiles_x * tile_size
+    empty_row = bytes([NO_SPACE]) * row_width
+
+    with open(filename, "r") as f, open(tiled_filename, 'wb') as out:
+        out.write(TILE_HEADER.pack(TILE_MAGIC, tile_size, width, height, len(waypoints), space_count, wall_count,
+                                   x_lo, x_hi, y_lo, y_hi))
+        for char, (x, y) in waypoints.items():
+            out.write(BINARY_WAYPOINT.pack(char.encode('ascii'), x, y))
+
+        band = []
+        for line in f:
+            codes = line.rstrip('\n').encode('latin-1', 'replace').translate(CODE_TABLE)
+            band.append(codes + empty_row[len(codes):])
+            if len(band) == tile_size:
+                _write_band(out, band, tiles_x, tile_size)
+                band = []
+        if band:
+            band.extend([empty_row] * (tile_size - len(band)))
+            _write_band(out, band, tiles_x, tile_size)
+
+
+def _write_band(out, band, tiles_x, tile_size):
+    # writes the tiles of one band of tile_size rows
+    for tx in range(tiles_x):
+        start = tx * tile_size
+        out.write(b''.join(row[start:start + tile_size] for row in band))
+
+
+class TiledLevel(GridLevel):
+    """ A read-only GridLevel paged from a tiled level file on demand.
+
+    Only the tiles holding cells that are looked at are read, and at most max_tiles of them are kept, the least
+    recently used being dropped first, so levels far larger than memory can be searched. The walls and spaces
+    views, navigation_edges and the searches work on it as on any GridLevel; with compact=True the searches keep
+    no per-cell dictionaries either. Use convert_level_tiles to produce the file.
+
+    Attributes:
+        tile_size: The width and height of a tile, in cells.
+        max_tiles: The number of tiles the cache holds.
+        faults: Lookups that had to read their tile from disk.
+        hits: Lookups whose tile was already cached.
+        evictions: Tiles dropped from the cache to make room.
+    """
+
+    def __init__(self, filename, max_tiles=256):
+        self._file = open(filename, 'rb')
+        header = self._file.read(TILE_HEADER.size)
+        (magic, tile_size, width, height, waypoint_count, space_count, wall_count,
+         x_lo, x_hi, y_lo, y_hi) = TILE_HEADER.unpack(header)
+        if magic != TILE_MAGIC:
+            raise ValueError('Error: ' + filename + ' is not a tiled level file.')
+
+        waypoints = {}
+        for _ in range(waypoint_count):
+            char, x, y = BINARY_WAYPOINT.unpack(self._file.read(BINARY_WAYPOINT.size))
+            waypoints[char.decode('ascii')] = (x, y)
+
+        super().__init__(width, height, None, None, waypoints)
+        self.tile_size = tile_size
+        self.max_tiles = max_tiles
+        self._tiles_x = -(-width // tile_size)
+        self._tile_count = self._tiles_x * -(-height // tile_size)
+        self._data_start = self._file.tell()
+        self._counts = (space_count, wall_count)
+        self._bounds = (x_lo, x_hi, y_lo, y_hi)
+        self._cache = OrderedDict()
+        self.faults = 0
+        self.hits = 0
+        self.evictions = 0
+
+    def close(self):
+        """ Closes the level file and drops the cached tiles. """
+        self._cache.clear()
+        self._file.close()
+
+    def clear_cache(self):
+        """ Drops the cached tiles and resets the counters. """
+        self._cache.clear()
+        self.faults = self.hits = self.evictions = 0
+
+    def bounds(self):
+        """ Returns (x_lo, x_hi, y_lo, y_hi), the bounding box of all walls and spaces, as saved in the file. """
+        return self._bounds
+
+    def fingerprint(self):
+        """ Returns a digest of the walls and spaces, read through the file once. """
+        if self._fingerprint is None:
+            digest = sha256(b'%d,%d;' % (self.width, self.height))
+            self._file.seek(self._data_start)
+            for chunk in iter(lambda: self._file.read(1 << 20), b''):
+                digest.update(chunk)
+            self._fingerprint = (self.version, digest.hexdigest())
+        return self._fingerprint[1]
+
+    def _tile(self, tile):
+        # the cell codes of a tile, through the cache
+        cache = self._cache
+        data = cache.get(tile)
+        if data is not None:
+            cache.move_to_end(tile)
+            self.hits += 1
+            return data
+        self.faults += 1
+        size = self.tile_size * self.tile_size
+        self._file.seek(self._data_start + tile * size)
+        data = self._file.read(size)
+        cache[tile] = data
+        if len(cache) > self.max_tiles:
+            cache.popitem(last=False)
+            self.evictions += 1
+        return data
+
+    def _code(self, i):
+        y, x = divmod(i, self.width)
+        size = self.tile_size
+        ty, cy = divmod(y, size)
+        tx, cx = divmod(x, size)
+        return self._tile(ty * self._tiles_x + tx)[cy * size + cx]
+
+    def _cost(self, i):
+        return TILE_COSTS[self._code(i)]
+
+    def _is_wall(self, i):
+        return self._code(i) == WALL_CODE
+
+    def _row_empty(self, start, end):
+        return all(self._code(i) == NO_SPACE for i in range(start, end))
+
+    def _row_chars(self, start, end):
+        return list(bytes(map(self._code, range(start, end))).translate(TILE_CHARS).decode('ascii'))
+
+    def _indices(self, wanted):
+        # flat indices of the cells whose code passes wanted, tile by tile
+        size = self.tile_size
+        width, height = self.width, self.height
+        for tile in range(self._tile_count):
+            ty, tx = divmod(tile, self._tiles_x)
+            data = self._tile(tile)
+            for k, code in enumerate(data):
+                if wanted(code):
+                    cy, cx = divmod(k, size)
+                    x, y = tx * size + cx, ty * size + cy
+                    if x < width and y < height:
+                        yield y * width + x
+
+    def _wall_indices(self):
+        return self._indices(lambda code: code == WALL_CODE)
+
+    def _space_indices(self):
+        return self._indices(lambda code: code < WALL_CODE)
+
+    def _wall_count(self):
+        return self._counts[1]
+
+    def _space_count(self):
+        return self._counts[0]
+
+    def _set_cost(self, i, cost):
+        raise TypeError('Error: tiled levels are read-only.')
+
+    def _set_wall(self, i, wall):
+        raise TypeError('Error: tiled levels are read-only.')
+
+
+def load_level_tiles(filename, max_tiles=256):
+    """ Opens a level written by convert_level_tiles.
+
+    Args:
+        filename: The name of the tiled level file.
+        max_tiles: The number of tiles to keep cached.
+
+    Returns:
+        The TiledLevel.
+
+    """
+    return TiledLevel(filename, max_tiles)
@@ -0,0 +1,73 @@
+# Waypoint-to-waypoint route tables for P1
+
+from hashlib import sha256
+from math import inf
+import os
+import pickle
+
+from p1 import dijkstras_shortest_path_to_all, navigation_edges, path_from_parents
+from p1_support import load_level
+
+CACHE_DIR = '.p1_cache'
+
+
+def level_hash(filename):
+    """ Returns the sha256 hex digest of a level file's contents. """
+    digest = sha256()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def waypoint_matrix(level, adj=navigation_edges):
+    """ Calculates the cost and path between every ordered pair of waypoints in a level.
+
+    Runs one dijkstras_shortest_path_to_all per waypoint and rebuilds every path from its back pointers.
+
+    Args:
+        level: A loaded level, containing walls, spaces, and waypoints.
+        adj: An adjacency function returning cells adjacent to a given cell as well as their respective edge costs.
+
+    Returns:
+        A pair of dictionaries keyed by (src_waypoint, dst_waypoint): the path costs (inf when there is no path)
+        and the paths, in the order dijkstras_shortest_path returns them (None when there is no path).
+    """
+    waypoints = level['waypoints']
+    costs = {}
+    paths = {}
+    for src_waypoint, src in sorted(waypoints.items()):
+        parents = {}
+        costs_to_all = dijkstras_shortest_path_to_all(src, level, adj, parents)
+        for dst_waypoint, dst in sorted(waypoints.items()):
+            costs[(src_waypoint, dst_waypoint)] = costs_to_all.get(dst, inf)
+            paths[(src_waypoint, dst_waypoint)] = path_from_parents(parents, dst)
+    return costs, paths
+
+
+def load_waypoint_matrix(filename, cache_dir=CACHE_DIR):
+    """ Loads the waypoint cost and path tables for a level file, computing them only on a cache miss.
+
+    Results are stored in cache_dir under the sha256 of the level file, so editing the level invalidates them.
+
+    Args:
+        filename: The name of the text file containing the level.
+        cache_dir: The directory holding cached tables.
+
+    Returns:
+        The (costs, paths) pair returned by waypoint_matrix.
+    """
+    cache_file = os.path.join(cache_dir, level_hash(filename) + '.waypoints.pickle')
+    if os.path.exists(cache_file):
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+
+    result = waypoint_matrix(load_level(filename))
+
+    os.makedirs(cache_dir, exist_ok=True)
+    # write then rename so a concurrent reader never sees a partial file
+    with open(cache_file + '.tmp', 'wb') as f:
+        pickle.dump(result, f, pickle.HIGHEST_PROTOCOL)
+    os.replace(cache_file + '.tmp', cache_file)
+
+    return result